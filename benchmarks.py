@@ -0,0 +1,398 @@
+"""
+offline benchmarks for the SDK, backed by in-process stand-ins for the
+libpamac database, the transaction and the appimage feed.
+
+    python benchmarks.py --sizes 1000 10000 --output bench.json
+"""
+import argparse, json, os, platform, random, subprocess, sys, tempfile, time, tracemalloc, types
+from unittest import mock
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from Manjaro.SDK import Packages
+
+try:
+    from gi.repository import GLib
+except Exception as e:
+    GLib = None
+    print(e)
+
+try:
+    from Manjaro.SDK import Snaps, Flatpaks
+except Exception as e:
+    Snaps = Flatpaks = None
+    print(e)
+
+try:
+    from Manjaro.SDK import Appimages
+except Exception as e:
+    Appimages = None
+    print(e)
+
+try:
+    from Manjaro.SDK import PackageManager
+except Exception as e:
+    PackageManager = None
+    print(e)
+
+
+WORDS = ("editor", "image", "player", "audio", "video", "office", "browser", "terminal",
+         "python", "gtk", "qt", "kde", "gnome", "font", "theme", "driver", "library", "tool")
+
+
+class FakePackage():
+    """
+    stand-in for the libpamac package classes, unknown getters return
+    their field name
+    """
+    def __init__(self, name, repo, desc, version="1.0"):
+        self.name = name
+        self.repo = repo
+        self.desc = desc
+        self.version = version
+
+    def get_name(self):
+        return self.name
+
+    def get_repo(self):
+        return self.repo
+
+    def get_desc(self):
+        return self.desc
+
+    def get_version(self):
+        return self.version
+
+    def get_app_name(self):
+        return self.name.replace("-", " ").title()
+
+    def get_installed_version(self):
+        return None
+
+    def get_files(self):
+        return [f"/usr/share/{self.name}/{i}" for i in range(200)]
+
+    def __getattr__(self, attr):
+        if attr.startswith("get_"):
+            return lambda: attr[4:]
+        raise AttributeError(attr)
+
+
+class FakeDatabase():
+    """
+    stand-in for pamac.Database with a synthesized catalog
+    """
+    def __init__(self, size, repos=("core", "extra", "community"), categories=8, seed=0):
+        rnd = random.Random(seed)
+        self.repos = {repo: [] for repo in repos}
+        self.pkgs = {}
+        for i in range(size):
+            name = f"{rnd.choice(WORDS)}-{rnd.choice(WORDS)}-{i}"
+            repo = rnd.choice(repos)
+            desc = " ".join(rnd.choice(WORDS) for _ in range(12))
+            pkg = FakePackage(name, repo, desc)
+            self.repos[repo].append(pkg)
+            self.pkgs[name] = pkg
+            if i % 10 == 0:
+                self.repos[rnd.choice(repos)].append(FakePackage(name, repo, desc))
+        self.categories = ["Featured"] + [f"Category {i}" for i in range(categories)]
+        names = list(self.pkgs)
+        self.installed = set(names[::20])
+        self.outdated = set(names[::100])
+
+    def get_repos_names(self):
+        return list(self.repos)
+
+    def get_repo_pkgs(self, repo):
+        return self.repos[repo]
+
+    def get_pkg(self, name):
+        return self.pkgs.get(name)
+
+    def is_installed_pkg(self, name):
+        return name in self.installed
+
+    def get_installed_pkgs(self):
+        return [self.pkgs[name] for name in self.installed]
+
+    def get_sync_pkg(self, name):
+        pkg = self.pkgs.get(name)
+        if pkg is not None and name in self.outdated:
+            return FakePackage(name, pkg.repo, pkg.desc, "2.0")
+        return pkg
+
+    def get_categories_names(self):
+        return self.categories
+
+    def search_pkgs(self, value):
+        return [p for p in self.pkgs.values() if value in p.name or value in p.desc]
+
+    def _category(self, category):
+        step = len(self.categories)
+        index = self.categories.index(category)
+        return list(self.pkgs.values())[index::step]
+
+    def _async(self, result, callback, data):
+        def dispatch():
+            callback(self, result, *data)
+            return False
+        GLib.idle_add(dispatch)
+
+    def search_pkgs_async(self, value, callback, *data):
+        self._async(self.search_pkgs(value), callback, data)
+
+    def search_pkgs_finish(self, result):
+        return result
+
+    def search_snaps_async(self, value, callback, *data):
+        self._async(self.search_pkgs(value), callback, data)
+
+    def search_snaps_finish(self, result):
+        return result
+
+    def search_flatpaks_async(self, value, callback, *data):
+        self._async(self.search_pkgs(value), callback, data)
+
+    def search_flatpaks_finish(self, result):
+        return result
+
+    def get_category_snaps_async(self, category, callback, *data):
+        self._async(self._category(category), callback, data)
+
+    def get_category_snaps_finish(self, result):
+        return result
+
+    def get_category_flatpaks_async(self, category, callback, *data):
+        self._async(self._category(category), callback, data)
+
+    def get_category_flatpaks_finish(self, result):
+        return result
+
+    def get_snap_async(self, name, callback, *data):
+        self._async(self.pkgs.get(name), callback, data)
+
+    def get_snap_finish(self, result):
+        return result
+
+
+class FakeTransaction():
+    """
+    stand-in for pamac.Transaction that only records what is submitted
+    """
+    def __init__(self, database=None):
+        self.calls = 0
+
+    def connect(self, *args):
+        pass
+
+    def __getattr__(self, attr):
+        if attr.startswith(("add_", "set_")):
+            def call(*args):
+                self.calls += 1
+            return call
+        raise AttributeError(attr)
+
+
+class FakeConfig():
+    def __init__(self, conf_path=None):
+        self.conf_path = conf_path
+
+    def set_enable_aur(self, enable):
+        pass
+
+    def set_enable_snap(self, enable):
+        pass
+
+    def set_enable_flatpak(self, enable):
+        pass
+
+
+class FakePamac():
+    def __init__(self, db):
+        self.db = db
+        self.config = FakeConfig()
+        self.loop = GLib.MainLoop() if GLib is not None else None
+
+    def get_repos(self):
+        return self.db.get_repos_names()
+
+    def get_categories(self):
+        return self.db.get_categories_names()
+
+
+def make_pamac(db, options=None):
+    """
+    build a real PackageManager.Pamac over db, with the libpamac Config,
+    Database and Transaction classes replaced by the stand-ins
+    """
+    fake = types.SimpleNamespace(Config=FakeConfig, Database=lambda config: db, Transaction=FakeTransaction)
+    options = {"config_path": "/etc/pamac.conf", "dry_run": True, "upgrade": False, "aur": False, **(options or {})}
+    with mock.patch.object(PackageManager, "pamac", fake):
+        return PackageManager.Pamac(options)
+
+
+def make_feed(size, seed=0):
+    rnd = random.Random(seed)
+    items = []
+    for i in range(size):
+        items.append({
+            "name": f"{rnd.choice(WORDS).title()}_{rnd.choice(WORDS)}-{i}",
+            "description": "<p>" + " ".join(rnd.choice(WORDS) for _ in range(30)) + "</p>",
+            "license": "MIT" if i % 3 else None,
+            "links": [{"type": "GitHub", "url": f"owner{i}/app{i}"}],
+            "icons": [f"app{i}/icons/128x128/app{i}.png"],
+            "screenshots": [f"app{i}/screenshot.png"]
+        })
+    return {"items": items}
+
+
+def measure(name, size, func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    result = {"name": name, "size": size, "best": min(times), "mean": sum(times) / len(times), "repeat": repeat}
+    print(f"{name:<32} {size:>8} {result['best'] * 1000:>10.2f} ms {result['mean'] * 1000:>10.2f} ms")
+    return result
+
+
+def measure_memory(name, size, func):
+    tracemalloc.start()
+    try:
+        func()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    result = {"name": name, "size": size, "peak_bytes": peak}
+    print(f"{name:<32} {size:>8} {peak / 1024:>10.1f} KiB peak")
+    return result
+
+
+def measure_footprint(name, size, func, get):
+    """
+    report the memory retained by what func builds, in total and per entry
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        func()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    retained = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    entries = len(get()) or 1
+    result = {"name": name, "size": size, "retained_bytes": retained, "per_entry_bytes": retained / entries}
+    print(f"{name:<32} {size:>8} {retained / entries:>10.1f} B/entry")
+    return result
+
+
+def bench_packages(size, repeat):
+    db = FakeDatabase(size)
+    package = Packages.Package(FakePamac(db))
+    names = list(db.pkgs)[:200]
+    yield measure("package.get_available", size, package.get_available, repeat)
+    yield measure("package.iter_available.first", size, lambda: next(package.iter_available()), repeat)
+    yield measure("package.search", size, lambda: package.search("editor"), repeat)
+    yield measure("package.get_details.page", size,
+                  lambda: [(d["title"], d["icon"], d["version"]) for d in map(package.get_details, names[:50])], repeat)
+    yield measure("package.get_details_many", size, lambda: package.get_details_many(names), repeat)
+    yield measure("package.get_app_names_many", size, lambda: package.get_app_names_many(names), repeat)
+
+
+def bench_snaps(size, repeat):
+    if Snaps is None or GLib is None:
+        return
+    db = FakeDatabase(size)
+    pm = FakePamac(db)
+    snap = Snaps.Snap(pm)
+    flatpak = Flatpaks.Flatpak(pm)
+    names = list(db.pkgs)[:200]
+    yield measure("snap.get_available", size, snap.get_available, repeat)
+    yield measure("flatpak.get_available", size, flatpak.get_available, repeat)
+    yield measure("snap.get_details_many", size, lambda: snap.get_details_many(names), repeat)
+    yield measure("snap.search", size, lambda: snap.search("editor"), repeat)
+    yield measure("flatpak.search", size, lambda: flatpak.search("editor"), repeat)
+
+
+def bench_appimages(size, repeat):
+    if Appimages is None:
+        return
+    os.environ["XDG_CACHE_HOME"] = tempfile.mkdtemp()
+    appimage = Appimages.Appimage(None)
+    os.makedirs(os.path.dirname(appimage.cache_file), exist_ok=True)
+    with open(appimage.cache_file, "w") as f:
+        json.dump(make_feed(size), f)
+
+    def build():
+        appimage._db = None
+        appimage.db
+
+    yield measure("appimage._build_db", size, build, repeat)
+    yield measure_memory("appimage._build_db.memory", size, build)
+    yield measure("appimage.iter_db.first", size, lambda: next(appimage.iter_db()), repeat)
+    yield measure_footprint("appimage.db.footprint", size, build, lambda: appimage._db)
+    yield measure("appimage.search", size, lambda: appimage.search("editor", limit=50), repeat)
+    names = [app["name"] for app in appimage.db[:200]]
+    yield measure("appimage.get_details", size, lambda: [appimage.get_details(n) for n in names], repeat)
+
+
+def bench_transaction(size, repeat):
+    if PackageManager is None:
+        return
+    db = FakeDatabase(size)
+    names = list(db.pkgs)
+
+    def prepare():
+        pm = make_pamac(db, {"upgrade": True})
+        pm.package.install = names[:min(500, size)] * 2
+        pm.package.remove = names[-min(100, size // 2):]
+        pm._prepare_transaction()
+
+    yield measure("pamac._prepare_transaction", size, prepare, repeat)
+
+
+def bench_search_all(size, repeat):
+    if PackageManager is None:
+        return
+    pm = make_pamac(FakeDatabase(size))
+    pm.appimage.cache_file = os.path.join(tempfile.mkdtemp(), "appimage-feed.json")
+    with open(pm.appimage.cache_file, "w") as f:
+        json.dump(make_feed(size), f)
+    pm.appimage.db
+    yield measure("pamac.search_all", size, lambda: list(pm.search_all("editor")), repeat)
+    yield measure("pamac.search_all.first", size, lambda: next(pm.search_all("editor")), repeat)
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manjaro SDK offline benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in args.sizes:
+        for bench in (bench_packages, bench_snaps, bench_appimages, bench_transaction, bench_search_all):
+            results.extend(bench(size, args.repeat) or ())
+
+    report = {
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "time": time.time(),
+        "results": results
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,273 @@
-from urllib import request
+from urllib import request, error
+from http import client
 from Manjaro.SDK import Utils
-import json, pathlib, subprocess, os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import io, json, pathlib, queue, shutil, subprocess, sys, os, threading, time
 import gi
 gi.require_version('Gtk', '3.0')
-from gi.repository import Gio, Gtk
+from gi.repository import Gio, GLib, Gtk
+
+
+class AppimageRecord(dict):
+    """
+    compact, read only catalog entry. only title, description and license
+    are stored in the dict, constant fields are shared and urls are derived
+    from the owner/repo path on access, while the record still behaves,
+    and serializes, like the dict _build_db used to return.
+    """
+    __slots__ = ("_source", "path", "_icon", "_screenshots")
+    _keys = ("license", "name", "version", "url", "format", "repository",
+             "title", "description", "screenshots", "icon")
+    format = "appimage"
+    repository = "https://github.com/AppImage/appimage.github.io"
+    version = None
+
+    def __init__(self, source, path, title, description, license, icon, screenshots):
+        super().__init__(title=title, description=description, license=sys.intern(license) if license else None)
+        self._source = source
+        self.path = path
+        self._icon = icon
+        self._screenshots = screenshots
+
+
+    @property
+    def title(self):
+        return dict.__getitem__(self, "title")
+
+
+    @property
+    def description(self):
+        return dict.__getitem__(self, "description")
+
+
+    @property
+    def license(self):
+        return dict.__getitem__(self, "license")
+
+
+    @property
+    def name(self):
+        return self.path.replace("/", ".")
+
+
+    @property
+    def url(self):
+        return f"{self._source.git_url}{self.path}/releases"
+
+
+    @property
+    def icon(self):
+        if self._icon is None:
+            return None
+        return self._source.data_url + self._icon
+
+
+    @property
+    def screenshots(self):
+        if self._screenshots is None:
+            return ""
+        data_url = self._source.data_url
+        return [img if img.startswith("http") else data_url + img for img in self._screenshots]
+
+
+    def __missing__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        return getattr(self, key)
+
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+    def __contains__(self, key):
+        return key in self._keys
+
+
+    def __iter__(self):
+        return iter(self._keys)
+
+
+    def __len__(self):
+        return len(self._keys)
+
+
+    def keys(self):
+        return self.to_dict().keys()
+
+
+    def items(self):
+        return self.to_dict().items()
+
+
+    def values(self):
+        return self.to_dict().values()
+
+
+    def copy(self) -> dict:
+        return self.to_dict()
+
+
+    def to_dict(self) -> dict:
+        return {key: self[key] for key in self._keys}
+
+
+    def __eq__(self, other):
+        if isinstance(other, dict):
+            return self.to_dict() == (other.to_dict() if isinstance(other, AppimageRecord) else other)
+        return NotImplemented
+
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+
+    __hash__ = None
+
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("AppimageRecord is read only")
+
+
+    __setitem__ = __delitem__ = update = pop = popitem = setdefault = clear = _read_only
+
+
+    def __reduce__(self):
+        return (dict, (self.to_dict(),))
+
+
+    def __repr__(self):
+        return f"AppimageRecord({self.to_dict()!r})"
+
+
+class InstalledIndex():
+    """
+    appimages integrated into the user application directory. desktop
+    entries are parsed once and kept until their mtime changes. once
+    start_monitor() is called a Gio directory monitor, attached to a private
+    main context drained on every lookup, updates single entries in place.
+    """
+    def __init__(self, path=None, load=None):
+        data_home = os.environ.get("XDG_DATA_HOME") or os.path.join(pathlib.Path.home(), ".local", "share")
+        self.path = path or os.path.join(data_home, "applications")
+        self._load = load or Gio.DesktopAppInfo.new_from_filename
+        self._entries = {}
+        self._installed = None
+        self._signature = None
+        self._monitor = None
+        self._context = None
+        self._lock = threading.RLock()
+
+
+    def _parse(self, path):
+        try:
+            app = self._load(path)
+        except (TypeError, GLib.Error):
+            return None
+        if app is None or not (app.get_executable() or "").endswith("AppImage"):
+            return None
+        return app
+
+
+    def _get_signature(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+
+    def _update(self, path):
+        """
+        reparse path if it changed on disk, or drop it when it is gone
+        """
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            if self._entries.pop(path, None) is not None:
+                self._installed = None
+            return
+        cached = self._entries.get(path)
+        if cached is None or cached[0] != mtime:
+            self._entries[path] = (mtime, self._parse(path))
+            self._installed = None
+
+
+    def scan(self):
+        """
+        stat the directory and reparse only new or modified entries
+        """
+        with self._lock:
+            self._signature = self._get_signature()
+            paths = set()
+            try:
+                with os.scandir(self.path) as entries:
+                    for entry in entries:
+                        if entry.name.endswith(".desktop") and entry.is_file():
+                            paths.add(entry.path)
+            except OSError:
+                pass
+            for path in paths.union(self._entries):
+                self._update(path)
+
+
+    def _on_changed(self, monitor, file, other_file, event):
+        for f in (file, other_file):
+            path = f.get_path() if f is not None else None
+            if path and path.endswith(".desktop"):
+                self._update(path)
+
+
+    def start_monitor(self) -> bool:
+        with self._lock:
+            if self._monitor is not None:
+                return True
+            context = GLib.MainContext()
+            context.push_thread_default()
+            try:
+                directory = Gio.File.new_for_path(self.path)
+                self._monitor = directory.monitor_directory(Gio.FileMonitorFlags.WATCH_MOVES, None)
+            except GLib.Error as e:
+                print("Error: ", e)
+                return False
+            finally:
+                context.pop_thread_default()
+            self._context = context
+            self._monitor.connect("changed", self._on_changed)
+            return True
+
+
+    def stop_monitor(self):
+        with self._lock:
+            if self._monitor is not None:
+                self._monitor.cancel()
+                self._monitor = None
+                self._context = None
+
+
+    def _dispatch(self):
+        if self._context is not None and self._context.acquire():
+            try:
+                while self._context.iteration(False):
+                    pass
+            finally:
+                self._context.release()
+
+
+    def get(self) -> tuple:
+        """
+        return the installed appimages as Gio.DesktopAppInfo objects
+        """
+        with self._lock:
+            self._dispatch()
+            if self._monitor is None or self._signature != self._get_signature():
+                self.scan()
+            if self._installed is None:
+                self._installed = tuple(app for path, (mtime, app) in sorted(self._entries.items()) if app is not None)
+            return self._installed
 
 
 class Appimage():
@@ -11,11 +275,100 @@ class Appimage():
         self.data_url = "https://raw.githubusercontent.com/AppImage/appimage.github.io/master/database/"
         self.git_url = "https://github.com/"
         self.provider = "https://appimage.github.io"
+        self.api_url = "https://api.github.com"
+        self.download_dir = os.path.join(pathlib.Path.home(), "Downloads")
+        self.max_workers = 4
+        self.chunk_size = 64 * 1024
         self.pm = pm_instance
         self.install = []
         self.remove = []
-        self.db = self._build_db()
-        
+        self.cache_ttl = 24 * 60 * 60
+        self._cache_file = None
+        self._db = None
+        self._names = {}
+        self._titles = {}
+        self._descriptions = {}
+        self._search_index = None
+        self.installed = InstalledIndex()
+
+
+    @property
+    def db(self):
+        """
+        appimage catalog, built on first use
+        """
+        self._load_db()
+        return self._db
+
+
+    def _load_db(self):
+        if self._db is None:
+            self._db = self._build_db()
+            self._build_indexes()
+
+
+    def refresh(self):
+        """
+        revalidate the feed and update the catalog and its indexes in place,
+        return the added, removed and updated names
+        """
+        if self._db is None:
+            self._db = []
+            self._build_indexes()
+        db = self._build_db(revalidate=True)
+
+        new = {app["name"]: app for app in db}
+        changes = {
+            "added": [name for name in new if name not in self._names],
+            "removed": [name for name in self._names if name not in new],
+            "updated": [name for name, app in new.items() if name in self._names and self._names[name] != app]
+        }
+        for name in changes["removed"] + changes["updated"]:
+            self._unindex(self._names.pop(name))
+        for name in changes["added"] + changes["updated"]:
+            self._index(new[name])
+        self._db = db
+        return changes
+
+
+    def _index(self, app):
+        self._names[app["name"]] = app
+        self._titles.setdefault(app["title"], app)
+        self._descriptions.setdefault(app["description"], app)
+        self._search_index.add(app["name"], app["name"].split(".", 1)[-1], app["title"], app["description"])
+
+
+    def _unindex(self, app):
+        if self._titles.get(app["title"]) is app:
+            del self._titles[app["title"]]
+        if self._descriptions.get(app["description"]) is app:
+            del self._descriptions[app["description"]]
+        self._search_index.remove(app["name"])
+
+
+    def _build_indexes(self):
+        self._names = {}
+        self._titles = {}
+        self._descriptions = {}
+        self._search_index = Utils.SearchIndex()
+        for app in self._db:
+            self._index(app)
+
+
+    @property
+    def cache_file(self):
+        """
+        path of the cached feed, resolved on first use without touching the disk
+        """
+        if self._cache_file is None:
+            self._cache_file = os.path.join(Utils.get_cache_dir(create=False), "appimage-feed.json")
+        return self._cache_file
+
+
+    @cache_file.setter
+    def cache_file(self, path):
+        self._cache_file = path
+
 
     def is_plugin_installed(self):
         return os.path.exists("/usr/bin/ail-cli")
@@ -28,50 +381,214 @@ class Appimage():
             return data
 
 
-    def search(self, value):
-        pkgs = []
-        search_value = value.lower()
-        for app in self.db:
-            name = app["name"].split(".")[1].lower()
-            title = app["title"].lower()
-            desc = app["description"].lower()
-            if search_value in name:
-                pkgs.append(app["name"])
-            elif search_value in title:
-                pkgs.append(app["name"])
-            elif search_value in desc:
-                pkgs.append(app["name"])
-        return tuple(pkgs)
+    def _read_cache_meta(self):
+        try:
+            with open(f"{self.cache_file}.meta", "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+
+    def _write_cache(self, response):
+        """
+        store the response as the cached feed once it parses, so a malformed
+        or truncated body leaves the last good feed in place
+        """
+        tmp = f"{self.cache_file}.tmp"
+        with open(tmp, "wb") as f:
+            shutil.copyfileobj(response, f, self.chunk_size)
+        try:
+            for app in self.iter_db(open(tmp, "rb")):
+                pass
+        except ValueError as e:
+            print("Error: ", e)
+            os.remove(tmp)
+            return
+        os.replace(tmp, self.cache_file)
+        meta = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified")
+        }
+        with open(f"{self.cache_file}.meta", "w") as f:
+            json.dump(meta, f)
+
+
+    def _open_feed(self, revalidate=False):
+        """
+        return the appimage feed file from the local cache, revalidating it
+        against the provider once the cache is older than cache_ttl or when
+        asked to. falls back to the last good snapshot when offline.
+        """
+        try:
+            age = time.time() - os.path.getmtime(self.cache_file)
+        except OSError:
+            age = None
+
+        if revalidate or age is None or age >= self.cache_ttl:
+            req = request.Request(f"{self.provider}/feed.json")
+            if age is not None:
+                meta = self._read_cache_meta()
+                if meta.get("etag"):
+                    req.add_header("If-None-Match", meta["etag"])
+                if meta.get("last_modified"):
+                    req.add_header("If-Modified-Since", meta["last_modified"])
+
+            try:
+                with request.urlopen(req) as response:
+                    try:
+                        os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+                    except OSError as e:
+                        print("Error: ", e)
+                        return io.BytesIO(response.read())
+                    self._write_cache(response)
+            except error.HTTPError as e:
+                if e.code == 304:
+                    os.utime(self.cache_file)
+                else:
+                    print("Error: ", e)
+            except (OSError, client.HTTPException) as e:
+                print("Error: ", e)
+
+        try:
+            return open(self.cache_file, "rb")
+        except OSError:
+            return io.BytesIO(b'{"items": []}')
+
+
+    def search(self, value, limit=None):
+        """
+        return appimage names matching value, name matches first,
+        then title and description matches.
+        """
+        self._load_db()
+        return tuple(self._search_index.search(value, limit))
 
 
     def package_exists(self, pkg):
-        for app in self.db:
-            if pkg == app["name"]:
-                return True
-            else:
-                return False
+        self._load_db()
+        return pkg in self._names
 
 
     def download(self, download, target):
-        request.urlretrieve(download, target)
+        self._stream(download, target)
         self.integrate(target)
 
 
+    def _emit(self, **kwargs):
+        if self.pm is not None:
+            self.pm.on_msg_emit(**kwargs)
+
+
+    def _stream(self, download, target, emit=None):
+        """
+        download into target.part in chunks, resuming a previous partial
+        download, then move it into place. progress goes to emit, which
+        defaults to on_msg_emit.
+        """
+        emit = emit or self._emit
+        part = f"{target}.part"
+        try:
+            offset = os.path.getsize(part)
+        except OSError:
+            offset = 0
+
+        req = request.Request(download)
+        if offset:
+            req.add_header("Range", f"bytes={offset}-")
+
+        action = f"Downloading {os.path.basename(target)}"
+        try:
+            response = request.urlopen(req)
+        except error.HTTPError as e:
+            if e.code != 416 or not offset:
+                raise
+            # nothing left to send: the part file is already complete,
+            # unless the server reports a different size
+            size = (e.headers.get("Content-Range") or "").rpartition("/")[2]
+            if size.isdigit() and int(size) != offset:
+                os.remove(part)
+                return self._stream(download, target, emit)
+            os.replace(part, target)
+            emit(action=action, status=f"{offset}/{offset}", progress=1.0)
+            return target
+
+        with response:
+            if response.status != 206:
+                offset = 0
+            length = response.headers.get("Content-Length")
+            total = offset + int(length) if length else None
+            received = offset
+            with open(part, "ab" if offset else "wb") as f:
+                while True:
+                    chunk = response.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    received += len(chunk)
+                    if total:
+                        emit(action=action, status=f"{received}/{total}", progress=received / total)
+                    else:
+                        emit(action=action, status=f"{received}")
+
+        if total is not None and received != total:
+            # the connection closed early, keep the part file to resume from
+            raise OSError(f"incomplete download of {download}: {received}/{total} bytes")
+        os.replace(part, target)
+        return target
+
+
     def integrate(self, target):
         subprocess.run(["ail-cli", "integrate", target])
 
 
+    def _fetch(self, pkg, emit=None):
+        name = pkg.replace('.', '/')
+        release = self._get_json(f"{self.api_url}/repos/{name}/releases")
+        id = release[0]["id"]
+        assets = self._get_json(f"{self.api_url}/repos/{name}/releases/{id}/assets")
+        download = assets[0]["browser_download_url"]
+        file_name = assets[0]["name"]
+        os.makedirs(self.download_dir, exist_ok=True)
+        target = os.path.join(self.download_dir, file_name)
+        return self._stream(download, target, emit)
+
+
     def transaction_install(self):
-        for pkg in self.install:
-            name = pkg.replace('.', '/')
-            release = self._get_json(f"https://api.github.com/repos/{name}/releases")
-            id = release[0]["id"]
-            assets = self._get_json(f"https://api.github.com/repos/{name}/releases/{id}/assets")
-            download = assets[0]["browser_download_url"]
-            file_name = assets[0]["name"]
-            home = pathlib.Path.home()
-            target = f"{home}/Downloads/{file_name}"
-            self.download(download, target)
+        """
+        resolve and download all appimages concurrently,
+        integrating each one as soon as its download completes.
+        downloads queue their progress, which is emitted from the
+        calling thread so on_msg_emit never runs on a pool thread.
+        """
+        pkgs = list(dict.fromkeys(self.install))
+        if not pkgs:
+            return
+
+        events = queue.Queue()
+        def emit(**kwargs):
+            events.put(kwargs)
+
+        def flush():
+            while True:
+                try:
+                    self._emit(**events.get_nowait())
+                except queue.Empty:
+                    return
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pkgs))) as pool:
+            futures = {pool.submit(self._fetch, pkg, emit): pkg for pkg in pkgs}
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                flush()
+                for future in done:
+                    pkg = futures[future]
+                    try:
+                        target = future.result()
+                    except (OSError, client.HTTPException, ValueError, KeyError, IndexError, TypeError) as e:
+                        self._emit(message=f"Error: {pkg}: {e}")
+                    else:
+                        self.integrate(target)
 
 
     def transaction_remove(self):
@@ -80,24 +597,14 @@ class Appimage():
 
 
     def get_details(self, pkg):
-        for app in self.db:
-            if pkg == app["name"]:
-                return app 
+        self._load_db()
+        return self._names.get(pkg)
 
 
     def get_available(self):
         return tuple(self.db)
 
 
-    def _is_appimage(self, app):
-        local = ".local"
-        exec = app.get_executable()
-        if local in app.get_filename() and exec.endswith("AppImage"):
-            return True
-        else:
-            return False
-
-    
     def get_installed_details(self, app):
         info = {}
         files = info["files"] = {}
@@ -112,64 +619,71 @@ class Appimage():
         files["appimage"] = app.get_executable()
         info["title"] = app.get_name()
         info["description"] = app.get_description()
-        for p in self.db:
-            if p["title"] == info["title"]:
-                info["package"] = p["name"]
-            elif p["description"] == info["description"]:
-                info["package"] = p["name"]
+        self._load_db()
+        p = self._titles.get(info["title"]) or self._descriptions.get(info["description"])
+        if p is not None:
+            info["package"] = p["name"]
         return info
 
 
     def get_installed(self):
-        installed = []
-        for app in Gio.AppInfo.get_all():
-            if self._is_appimage(app):
-                installed.append(app)
-        return installed
-
-
-    def _build_db(self):
-        appimage = []
-        feed = self._get_json(f"{self.provider}/feed.json")
-        for app in feed["items"]:
-            app_data = {}
-            try:
-                links = app["links"]
-                if app["license"]:
-                    app_data["license"] = app["license"]
-                else:
-                    app_data["license"] = None
-
-                app_data["name"] = links[0]["url"].replace("/", ".")
-                app_data["version"] = None
-                app_data["url"] = self.git_url + links[0]["url"] + "/releases"
-                app_data["format"] = "appimage"
-                app_data["repository"] = "https://github.com/AppImage/appimage.github.io"
-                app_data["title"] = app["name"].replace("_", " ").replace(".", " ").replace("-", " ")
-                
-                try:
-                    app_data["description"] = Utils.strip_html(app["description"])
-                except KeyError:
-                    app_data["description"] = "No description available"
-                
-                try:
-                    screenshots = []
-                    for img in app["screenshots"]:
-                        if not img.startswith("http"):
-                            img = self.data_url + img
-                        screenshots.append(img)
+        self.installed.start_monitor()
+        return list(self.installed.get())
+
 
-                    app_data["screenshots"] = screenshots
-                except (KeyError, TypeError):
-                    app_data["screenshots"] = ""
+    def _parse_item(self, app):
+        path = app["links"][0]["url"]
+        title = app["name"].replace("_", " ").replace(".", " ").replace("-", " ")
+
+        try:
+            description = Utils.strip_html(app["description"])
+        except KeyError:
+            description = "No description available"
+
+        screenshots = app.get("screenshots")
+        if not isinstance(screenshots, list):
+            screenshots = None
+        else:
+            screenshots = tuple(screenshots)
 
+        icon = app["icons"][0] if app["icons"] else None
+        return AppimageRecord(self, path, title, description, app["license"], icon, screenshots)
+
+
+    def iter_db(self, feed=None):
+        """
+        parse the feed in a single streaming pass, yielding each entry once.
+        raises ValueError when the feed is malformed or truncated.
+        """
+        names = set()
+        with feed or self._open_feed() as f:
+            for app in Utils.iter_json_array(f, "items"):
                 try:
-                    app_data["icon"] = self.data_url + app["icons"][0]
-                except TypeError:
-                    app_data["icon"] = None
+                    app_data = self._parse_item(app)
+                    name = app_data.name
+                except (TypeError, KeyError, IndexError, AttributeError):
+                    continue
+                if name not in names:
+                    names.add(name)
+                    yield app_data
+
 
-                if app_data["name"] not in (p["name"] for p in appimage):
-                    appimage.append(app_data)
-            except (TypeError, KeyError):
+    def _discard_cache(self):
+        for path in (self.cache_file, f"{self.cache_file}.meta"):
+            try:
+                os.remove(path)
+            except OSError:
                 pass
-        return appimage
\ No newline at end of file
+
+
+    def _build_db(self, revalidate=False):
+        """
+        parse the feed into a list, keeping the previous catalog when the
+        feed is broken instead of storing a partial one
+        """
+        try:
+            return list(self.iter_db(self._open_feed(revalidate)))
+        except ValueError as e:
+            print("Error: ", e)
+            self._discard_cache()
+            return self._db if self._db is not None else []
@@ -0,0 +1,160 @@
+import asyncio
+from gi.repository import GLib
+from Manjaro.SDK import Snaps, Flatpaks
+from Manjaro.SDK.Details import LazyDetails
+from Manjaro.SDK.PackageManager import Pamac
+
+
+class AsyncPamac():
+    """
+    asyncio front end for Pamac. libpamac async calls are bridged to
+    asyncio futures and the GLib main context is iterated from the
+    asyncio loop while calls are pending, so nothing blocks on loop.run()
+    and many queries can be gathered at once.
+    """
+    def __init__(self, pm_instance=None, interval=0.005):
+        self.pm = pm_instance if pm_instance is not None else Pamac()
+        self.interval = interval
+        self._pending = 0
+        self._pump_task = None
+
+
+    async def _iterate(self):
+        context = GLib.MainContext.default()
+        while self._pending:
+            while context.iteration(False):
+                pass
+            await asyncio.sleep(self.interval)
+
+
+    def _pump(self):
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.get_running_loop().create_task(self._iterate())
+
+
+    async def _call(self, source, method, *args, finish):
+        if self.pm.worker is not None:
+            return await asyncio.wrap_future(self.pm.worker.call(source, method, *args, finish=finish))
+        future = asyncio.get_running_loop().create_future()
+
+        def callback(source_object, result, data):
+            self._pending -= 1
+            if future.cancelled():
+                return
+            try:
+                future.set_result(getattr(source_object, finish)(result))
+            except GLib.GError as e:
+                future.set_exception(e)
+
+        getattr(source, method)(*args, callback, None)
+        self._pending += 1
+        self._pump()
+        return await future
+
+
+    async def _blocking(self, func, *args):
+        """
+        run a blocking Pamac method. in threaded mode it hands its libpamac
+        work to the worker, so it only waits in the executor; otherwise it
+        runs on the loop thread, the one that dispatches the async callbacks
+        for the same database.
+        """
+        if self.pm.worker is not None:
+            return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+        return func(*args)
+
+
+    async def search_pkgs(self, pkg: str) -> tuple:
+        return tuple(await self._call(self.pm.db, "search_pkgs_async", pkg, finish="search_pkgs_finish"))
+
+
+    async def search_snaps(self, pkg: str) -> tuple:
+        return tuple(await self._call(self.pm.db, "search_snaps_async", pkg, finish="search_snaps_finish"))
+
+
+    async def search_flatpaks(self, pkg: str) -> tuple:
+        return tuple(await self._call(self.pm.db, "search_flatpaks_async", pkg, finish="search_flatpaks_finish"))
+
+
+    async def search_appimages(self, pkg: str) -> tuple:
+        return await asyncio.get_running_loop().run_in_executor(None, self.pm.appimage.search, pkg)
+
+
+    async def get_pkg_details(self, pkg):
+        return await self._blocking(self.pm.get_pkg_details, pkg)
+
+
+    async def get_snap_details(self, pkg):
+        if self.pm.worker is not None:
+            return await asyncio.wrap_future(self.pm.worker.get_snap_details(pkg))
+        p = await self._call(self.pm.db, "get_snap_async", pkg, finish="get_snap_finish")
+        return LazyDetails(p, Snaps.DETAILS) if p is not None else {}
+
+
+    async def get_flatpak_details(self, pkg):
+        if not isinstance(pkg, str):
+            return await self._blocking(self.pm.get_flatpak_details, pkg)
+        if self.pm.worker is not None:
+            return await asyncio.wrap_future(self.pm.worker.get_flatpak_details(pkg))
+        p = await self._call(self.pm.db, "get_flatpak_async", pkg, finish="get_flatpak_finish")
+        return LazyDetails(p, Flatpaks.DETAILS) if p is not None else {}
+
+
+    async def _get_categories(self, kind):
+        categories = [c for c in await self._blocking(self.pm.get_categories) if c != "Featured"]
+        results = await asyncio.gather(*(
+            self._call(self.pm.db, f"get_category_{kind}_async", category, finish=f"get_category_{kind}_finish")
+            for category in categories
+        ), return_exceptions=True)
+        db = {}
+        for pkgs in results:
+            if isinstance(pkgs, GLib.GError):
+                print("Error: ", pkgs.message)
+                continue
+            for pkg in pkgs:
+                db.setdefault(pkg.get_name(), pkg)
+        return tuple(db.values())
+
+
+    async def get_all_pkgs(self) -> tuple:
+        return await self._blocking(self.pm.get_all_pkgs)
+
+
+    async def get_all_snaps(self) -> tuple:
+        return await self._get_categories("snaps")
+
+
+    async def get_all_flatpaks(self) -> tuple:
+        return await self._get_categories("flatpaks")
+
+
+    async def get_all_appimages(self) -> tuple:
+        return await asyncio.get_running_loop().run_in_executor(None, self.pm.get_all_appimages)
+
+
+    async def run(self):
+        """
+        run the pending transaction without blocking the asyncio loop
+        """
+        loop = asyncio.get_running_loop()
+        self.pm.on_before_transaction()
+        if self.pm.worker is not None:
+            ready = await asyncio.wrap_future(self.pm.worker.submit(self.pm._prepare_transaction))
+        else:
+            ready = self.pm._prepare_transaction()
+        if not ready:
+            return
+        future = loop.create_future()
+
+        def callback(source_object, result, data):
+            self._pending -= 1
+            try:
+                self.pm.on_transaction_finished_callback(source_object, result, data)
+            finally:
+                if not future.cancelled():
+                    future.set_result(None)
+
+        self.pm.transaction.run_async(callback, None)
+        self._pending += 1
+        self._pump()
+        await future
@@ -1,12 +1,124 @@
-from subprocess import Popen
+import os, threading, time
+from subprocess import Popen, PIPE, STDOUT
+
+
+class MirrorSwitch():
+    """
+    handle for a pacman-mirrors run. output lines are streamed to the
+    progress callbacks, and the exit status and elapsed time are kept.
+    """
+    def __init__(self, branch, cmd):
+        self.branch = branch
+        self.cmd = cmd
+        self.output = []
+        self.returncode = None
+        self.started = None
+        self.finished = None
+        self._progress = []
+        self._done = []
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+
+
+    def start(self):
+        self.started = time.monotonic()
+        try:
+            process = Popen(self.cmd, stdout=PIPE, stderr=STDOUT, text=True)
+        except OSError as e:
+            self.output.append(str(e))
+            self._finish(-1)
+            return self
+        threading.Thread(target=self._read, args=(process,), daemon=True).start()
+        return self
+
+
+    def _call(self, callback, *args):
+        try:
+            callback(self, *args)
+        except Exception as e:
+            print("Error: ", e)
+
+
+    def _read(self, process):
+        try:
+            for line in process.stdout:
+                line = line.rstrip("\n")
+                with self._lock:
+                    self.output.append(line)
+                    callbacks = list(self._progress)
+                for callback in callbacks:
+                    self._call(callback, line)
+        finally:
+            process.stdout.close()
+            self._finish(process.wait())
+
+
+    def _finish(self, returncode):
+        with self._lock:
+            self.returncode = returncode
+            self.finished = time.monotonic()
+            callbacks = list(self._done)
+            self._event.set()
+        for callback in callbacks:
+            self._call(callback)
+
+
+    def on_progress(self, callback):
+        """
+        call callback(switch, line) for every output line from now on
+        """
+        with self._lock:
+            self._progress.append(callback)
+
+
+    def on_done(self, callback):
+        """
+        call callback(switch) once the run finished, right away if it already has
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._done.append(callback)
+                return
+        self._call(callback)
+
+
+    def done(self) -> bool:
+        return self._event.is_set()
+
+
+    def wait(self, timeout=None):
+        """
+        wait for the run to finish and return its exit status
+        """
+        self._event.wait(timeout)
+        return self.returncode
+
+
+    @property
+    def success(self) -> bool:
+        return self.returncode == 0
+
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return None
+        return (self.finished or time.monotonic()) - self.started
 
 
 class Branch():
 
-    def __init__(self):
-        self.config = "/etc/pacman-mirrors.conf"
+    def __init__(self, config="/etc/pacman-mirrors.conf", command=("pacman-mirrors",)):
+        self.config = config
+        self.command = list(command)
+        self._branch = None
+        self._mtime = None
+        self._running = None
+        self._pending = None
+        self._lock = threading.Lock()
 
-    def get_branch(self):
+
+    def _read_branch(self):
         with open(self.config, "r") as f:
             for line in f:
                 if "Branch = " in line:
@@ -14,7 +126,58 @@ class Branch():
                     return branch
 
 
-    def set_branch_mirrors(self, branch):
-        cmd = ["pacman-mirrors", "--fasttrack",
-               "--api", "--set-branch", f"{branch}"]
-        Popen(cmd)
+    def get_branch(self):
+        """
+        return the configured branch, the config is only read again when it changed
+        """
+        try:
+            mtime = os.stat(self.config).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime is None or mtime != self._mtime:
+            self._branch = self._read_branch()
+            self._mtime = mtime
+        return self._branch
+
+
+    def set_branch_mirrors(self, branch, on_progress=None) -> MirrorSwitch:
+        """
+        switch to branch and return the MirrorSwitch handle of the run.
+        a request for the branch that is already being switched to joins
+        that run; other requests made meanwhile are coalesced into one
+        follow-up run for the branch requested last.
+        """
+        with self._lock:
+            running = self._running
+            if running is not None and not running.done():
+                if running.branch == branch and self._pending is None:
+                    switch = running
+                else:
+                    if self._pending is None:
+                        self._pending = MirrorSwitch(branch, self._get_cmd(branch))
+                    else:
+                        self._pending.branch = branch
+                        self._pending.cmd = self._get_cmd(branch)
+                    switch = self._pending
+            else:
+                switch = self._running = MirrorSwitch(branch, self._get_cmd(branch))
+                switch.on_done(self._on_switch_done)
+                switch.start()
+
+        if on_progress is not None:
+            switch.on_progress(on_progress)
+        return switch
+
+
+    def _get_cmd(self, branch):
+        return [*self.command, "--fasttrack", "--api", "--set-branch", f"{branch}"]
+
+
+    def _on_switch_done(self, switch):
+        with self._lock:
+            pending = self._pending
+            self._pending = None
+            self._running = pending
+        if pending is not None:
+            pending.on_done(self._on_switch_done)
+            pending.start()
@@ -0,0 +1,106 @@
+import os, threading, time
+from collections import OrderedDict
+
+
+_MISSING = object()
+
+
+class ResultCache():
+    """
+    bounded LRU cache with a per entry time to live.
+    hits, misses and evictions are counted so the size can be tuned.
+    """
+    def __init__(self, maxsize=256, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def __len__(self):
+        return len(self._data)
+
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[0] > time.monotonic()
+
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._data[key]
+            self.misses += 1
+            return default
+
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+
+    def get_or_set(self, key, func, keep=None):
+        """
+        return the cached value for key, calling func to fill it on a miss.
+        when keep is given the value is only stored if keep(value) is true.
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = func()
+            if keep is None or keep(value):
+                self.set(key, value)
+        return value
+
+
+    def discard(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+    def discard_if(self, predicate):
+        """
+        drop every entry whose key matches predicate
+        """
+        with self._lock:
+            for key in [key for key in self._data if predicate(key)]:
+                del self._data[key]
+
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+
+def get_dir_signature(path):
+    """
+    return the names and modification times of the files in path,
+    used to notice when databases change on disk
+    """
+    try:
+        with os.scandir(path) as entries:
+            return tuple(sorted((e.name, e.stat().st_mtime_ns) for e in entries))
+    except OSError:
+        return ()
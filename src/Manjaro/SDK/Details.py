@@ -0,0 +1,135 @@
+class LazyDetails(dict):
+    """
+    package details dict. each field is computed from the package object
+    the first time it is accessed and then stored in the dict itself;
+    anything that needs the whole dict (iteration, len, json, copies)
+    computes the remaining fields first.
+    """
+    __slots__ = ("_pkg", "_fields")
+
+    def __init__(self, pkg, fields):
+        super().__init__()
+        self._pkg = pkg
+        self._fields = fields
+        # json's C encoder returns "{}" for a dict with empty storage without
+        # calling items(), so resolve the first field, the constant format, now
+        for key in fields:
+            self[key]
+            break
+
+
+    def __missing__(self, key):
+        if key not in self._fields:
+            raise KeyError(key)
+        value = self[key] = self._fields[key](self._pkg)
+        return value
+
+
+    def _fill(self):
+        for key in self._fields:
+            if not dict.__contains__(self, key):
+                self[key]
+
+
+    def resolve(self):
+        """
+        compute every field now and return self, used to run the getters
+        on the thread that owns the package object
+        """
+        self._fill()
+        return self
+
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+    def __contains__(self, key):
+        return key in self._fields or dict.__contains__(self, key)
+
+
+    def __iter__(self):
+        yield from self._fields
+        for key in dict.__iter__(self):
+            if key not in self._fields:
+                yield key
+
+
+    def __len__(self):
+        return len(self._fields) + sum(1 for key in dict.__iter__(self) if key not in self._fields)
+
+
+    def keys(self):
+        self._fill()
+        return self.to_dict().keys()
+
+
+    def items(self):
+        self._fill()
+        return self.to_dict().items()
+
+
+    def values(self):
+        self._fill()
+        return self.to_dict().values()
+
+
+    def copy(self):
+        """
+        return a new LazyDetails over the same package that starts with
+        the fields computed so far, so writes to it stay private
+        """
+        details = LazyDetails(self._pkg, self._fields)
+        dict.update(details, dict.items(self))
+        return details
+
+
+    def __eq__(self, other):
+        self._fill()
+        if isinstance(other, LazyDetails):
+            other._fill()
+        return dict.__eq__(self, other)
+
+
+    def __ne__(self, other):
+        return not self == other
+
+
+    __hash__ = None
+
+
+    def __reduce__(self):
+        return (dict, (self.to_dict(),))
+
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+    def to_dict(self) -> dict:
+        """
+        return a plain dict with every field computed
+        """
+        self._fill()
+        return {key: dict.__getitem__(self, key) for key in self}
+
+
+def resolve(details):
+    """
+    compute every field of details now, plain dicts are returned as they are
+    """
+    return details.resolve() if isinstance(details, LazyDetails) else details
+
+
+def get_app_names(details) -> dict:
+    """
+    return a dict of name to application name from a dict of name to
+    details, None where the details are missing
+    """
+    names = {}
+    for pkg, info in details.items():
+        names[pkg] = (info["title"] or info["name"]) if info is not None else None
+    return names
@@ -1,6 +1,29 @@
 import gi
 from gi.repository import GLib
 from Manjaro.SDK import Utils
+from Manjaro.SDK.Details import LazyDetails, get_app_names
+
+
+DETAILS = {
+    "format": lambda p: "flatpak",
+    "app_id": lambda p: p.get_app_id(),
+    "title": lambda p: p.get_app_name(),
+    "description": lambda p: p.get_desc(),
+    "download_size": lambda p: Utils.convert_bytes_to_human(p.get_download_size()),
+    "icon": lambda p: p.get_icon(),
+    "id": lambda p: p.get_id(),
+    "install_date": lambda p: Utils.glib_date_to_string(p.get_install_date()),
+    "installed_size": lambda p: Utils.convert_bytes_to_human(p.get_installed_size()),
+    "installed_version": lambda p: p.get_installed_version(),
+    "launchable": lambda p: p.get_launchable(),
+    "license": lambda p: p.get_license(),
+    "long_description": lambda p: p.get_long_desc(),
+    "name": lambda p: p.get_name(),
+    "repository": lambda p: p.get_repo(),
+    "screenshots": lambda p: p.get_screenshots(),
+    "url": lambda p: p.get_url(),
+    "version": lambda p: p.get_version(),
+}
 
 class Flatpak():
     def __init__(self, pm_instance):
@@ -33,44 +56,74 @@ class Flatpak():
 
     
     def get_details(self, pkg):
-        info = {}      
-        info["format"] = "flatpak"  
-        info["app_id"] = pkg.get_app_id()
-        info["title"] = pkg.get_app_name()
-        info["description"] = pkg.get_desc()
-        info["download_size"] = Utils.convert_bytes_to_human(pkg.get_download_size())
-        info["icon"] = pkg.get_icon()
-        info["id"] = pkg.get_id()
-        info["install_date"] = Utils.glib_date_to_string(pkg.get_install_date())
-        info["installed_size"] = Utils.convert_bytes_to_human(pkg.get_installed_size())
-        info["installed_version"] = pkg.get_installed_version()
-        info["launchable"] = pkg.get_launchable()
-        info["license"] = pkg.get_license()
-        info["long_description"] = pkg.get_long_desc()
-        info["name"] = pkg.get_name()
-        info["repository"] = pkg.get_repo()
-        info["screenshots"] = pkg.get_screenshots()
-        info["url"] = pkg.get_url()
-        info["version"] = pkg.get_version()            
-        return info
-
-
-    def get_available(self, db=[]):
-        def on_category_ready(source_object, result):
+        return LazyDetails(pkg, DETAILS)
+
+
+    def get_details_many(self, pkgs):
+        """
+        return a dict of flatpak id to details, None for ids that could
+        not be found. ids are requested at once in a single loop run,
+        flatpak objects are used as they are.
+        """
+        pkgs = list(dict.fromkeys(pkgs))
+        details = {}
+        ids = [pkg for pkg in pkgs if isinstance(pkg, str)]
+
+        def callback(source_object, result, pkg):
             try:
-                pkgs = source_object.get_category_flatpaks_finish(result)
+                p = source_object.get_flatpak_finish(result)
             except GLib.GError as e:
                 print("Error: ", e.message)
+                p = None
+            details[pkg] = LazyDetails(p, DETAILS) if p is not None else None
+            if len(details) == len(pkgs):
+                self.pm.loop.quit()
+
+        for pkg in pkgs:
+            if isinstance(pkg, str):
+                self.pm.db.get_flatpak_async(pkg, callback, pkg)
             else:
-                for pkg in pkgs:
-                    if pkg.get_name() not in (p.get_name() for p in db):
-                        db.append(pkg)
+                details[pkg] = LazyDetails(pkg, DETAILS)
+
+        if ids:
+            self.pm.loop.run()
+
+        return {pkg: details[pkg] for pkg in pkgs}
+
+
+    def get_app_names_many(self, pkgs):
+        """
+        return a dict of flatpak id to application name,
+        None for ids that could not be found
+        """
+        return get_app_names(self.get_details_many(pkgs))
+
+
+    def get_available(self):
+        """
+        request every category at once and collect them in a single loop run
+        """
+        categories = [c for c in self.pm.get_categories() if c != "Featured"]
+        results = {}
+
+        def on_category_ready(source_object, result, category):
+            try:
+                results[category] = source_object.get_category_flatpaks_finish(result)
+            except GLib.GError as e:
+                print("Error: ", e.message)
+                results[category] = ()
             finally:
-                self.pm.loop.quit()
+                if len(results) == len(categories):
+                    self.pm.loop.quit()
+
+        for category in categories:
+            self.pm.db.get_category_flatpaks_async(category, on_category_ready, category)
 
-        for category in self.pm.get_categories():
-            if category !="Featured":
-                self.pm.db.get_category_flatpaks_async(category, on_category_ready)
-                self.pm.loop.run()
+        if categories:
+            self.pm.loop.run()
 
-        return tuple(db)
\ No newline at end of file
+        db = {}
+        for category in categories:
+            for pkg in results[category]:
+                db.setdefault(pkg.get_name(), pkg)
+        return tuple(db.values())
\ No newline at end of file
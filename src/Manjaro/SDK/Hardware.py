@@ -1,5 +1,22 @@
-import subprocess
-#import pyudev
+import os, subprocess, threading
+from collections import namedtuple
+try:
+    import pyudev
+except ImportError:
+    pyudev = None
+
+
+PciDevice = namedtuple("PciDevice", ["slot", "class_id", "vendor_id", "device_id",
+                                     "subsystem_vendor_id", "subsystem_device_id", "driver"])
+CpuInfo = namedtuple("CpuInfo", ["vendor", "model", "threads", "flags"])
+HardwareSnapshot = namedtuple("HardwareSnapshot", ["pci_devices", "gpus", "virtualization", "cpu"])
+
+VIRTUALIZATION = (
+    ("KVM", "kvm"), ("QEMU", "qemu"), ("VMware", "vmware"), ("VirtualBox", "oracle"),
+    ("innotek", "oracle"), ("Xen", "xen"), ("Bochs", "bochs"), ("Parallels", "parallels"),
+    ("BHYVE", "bhyve"), ("oVirt", "ovirt"), ("Amazon EC2", "amazon"),
+    ("Microsoft Corporation Virtual Machine", "microsoft"),
+)
 
 
 class Graphics:
@@ -12,22 +29,157 @@ class Graphics:
 
 
 class Info():
+    """
+    hardware facts read straight from sysfs and procfs in one pass and kept
+    as an immutable snapshot. refresh() rebuilds it, and start_monitor()
+    does so on udev hotplug events when pyudev is installed.
+    """
+    def __init__(self, root="/"):
+        self.root = root
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._observer = None
+
+
+    def _path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+
+    def _read(self, *parts):
+        try:
+            with open(self._path(*parts), "r") as f:
+                return f.read().strip()
+        except OSError:
+            return ""
+
 
-    def __init__(self):
-        #TODO hardware detection using udev
-        #self.context = pyudev.Context()
-        pass
+    def _read_pci_devices(self):
+        devices = []
+        base = self._path("sys", "bus", "pci", "devices")
+        try:
+            slots = sorted(os.listdir(base))
+        except OSError:
+            return ()
+        for slot in slots:
+            read = lambda name: self._read(base, slot, name)[2:]
+            driver = os.path.join(base, slot, "driver")
+            devices.append(PciDevice(
+                slot=slot,
+                class_id=read("class")[:4],
+                vendor_id=read("vendor"),
+                device_id=read("device"),
+                subsystem_vendor_id=read("subsystem_vendor"),
+                subsystem_device_id=read("subsystem_device"),
+                driver=os.path.basename(os.readlink(driver)) if os.path.islink(driver) else None
+            ))
+        return tuple(devices)
 
-    def graphics_driver(self):
-        subprocess.run(["mhwd", "-l", "-d"])
 
-    def is_virtual_machine(self):
-        detect_virtual_machine = subprocess.Popen(
-            ["systemd-detect-virt"], stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+    def _read_cpu(self):
+        vendor = model = ""
+        threads = 0
+        flags = frozenset()
+        try:
+            with open(self._path("proc", "cpuinfo"), "r") as f:
+                for line in f:
+                    key, _, value = line.partition(":")
+                    key = key.strip()
+                    if key == "processor":
+                        threads += 1
+                    elif threads == 1:
+                        if key == "vendor_id":
+                            vendor = value.strip()
+                        elif key == "model name":
+                            model = value.strip()
+                        elif key == "flags":
+                            flags = frozenset(value.split())
+        except OSError:
+            pass
+        return CpuInfo(vendor, model, threads, flags)
+
+
+    def _read_virtualization(self, cpu):
+        dmi = " ".join(
+            self._read("sys", "class", "dmi", "id", name)
+            for name in ("sys_vendor", "product_name", "board_vendor", "bios_vendor")
+        )
+        for marker, name in VIRTUALIZATION:
+            if marker in dmi:
+                return name
+        if "hypervisor" in cpu.flags:
+            return "unknown"
+        return None
+
+
+    def refresh(self) -> HardwareSnapshot:
+        cpu = self._read_cpu()
+        pci_devices = self._read_pci_devices()
+        snapshot = HardwareSnapshot(
+            pci_devices=pci_devices,
+            gpus=tuple(d for d in pci_devices if d.class_id.startswith("03")),
+            virtualization=self._read_virtualization(cpu),
+            cpu=cpu
         )
-        
-        result = detect_virtual_machine.communicate()[-1]
-        if result is None:
+        with self._lock:
+            self._snapshot = snapshot
+        return snapshot
+
+
+    def snapshot(self) -> HardwareSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.refresh()
+        return snapshot
+
+
+    def start_monitor(self):
+        """
+        refresh the snapshot on pci and drm hotplug events,
+        returns False when pyudev is not available
+        """
+        if pyudev is None:
             return False
-        else:
-            return True
+        if self._observer is None:
+            context = pyudev.Context()
+            monitor = pyudev.Monitor.from_netlink(context)
+            monitor.filter_by("pci")
+            monitor.filter_by("drm")
+            self._observer = pyudev.MonitorObserver(monitor, callback=lambda device: self.refresh())
+            self._observer.start()
+        return True
+
+
+    def stop_monitor(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+
+
+    def get_pci_devices(self) -> tuple:
+        return self.snapshot().pci_devices
+
+
+    def get_gpus(self) -> tuple:
+        return self.snapshot().gpus
+
+
+    def get_cpu(self) -> CpuInfo:
+        return self.snapshot().cpu
+
+
+    def graphics_driver(self) -> tuple:
+        """
+        return the kernel drivers bound to the graphics devices
+        """
+        return tuple(gpu.driver for gpu in self.snapshot().gpus if gpu.driver)
+
+
+    def get_virtualization(self):
+        """
+        return the detected hypervisor name, None on bare metal
+        """
+        return self.snapshot().virtualization
+
+
+    def is_virtual_machine(self) -> bool:
+        return self.snapshot().virtualization is not None
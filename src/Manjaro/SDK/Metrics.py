@@ -0,0 +1,176 @@
+import functools, inspect, threading, time
+
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Metric():
+    __slots__ = ("calls", "errors", "total", "buckets", "payload")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.payload = 0
+
+
+    def observe(self, elapsed, size, failed):
+        self.calls += 1
+        self.total += elapsed
+        if failed:
+            self.errors += 1
+        if size is not None:
+            self.payload += size
+        for i, bound in enumerate(BUCKETS):
+            if elapsed <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_seconds": self.total,
+            "payload_items": self.payload,
+            "buckets": dict(zip([*BUCKETS, "+Inf"], self.buckets))
+        }
+
+
+def _size(value):
+    if isinstance(value, (tuple, list, dict, set, frozenset)):
+        return len(value)
+    return None
+
+
+class Registry():
+    """
+    opt-in instrumentation of the public SDK methods. nothing is wrapped
+    until enable() is called, and disable() restores the original methods.
+    """
+    def __init__(self):
+        self.metrics = {}
+        self._patched = []
+        self._lock = threading.Lock()
+
+
+    def _observe(self, name, elapsed, size, failed):
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = Metric()
+            metric.observe(elapsed, size, failed)
+
+
+    def _wrap(self, name, func):
+        if inspect.isgeneratorfunction(func):
+            return self._wrap_generator(name, func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            failed = True
+            result = None
+            try:
+                result = func(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                self._observe(name, time.perf_counter() - start, _size(result), failed)
+        wrapper.__wrapped_by_metrics__ = func
+        return wrapper
+
+
+    def _wrap_generator(self, name, func):
+        """
+        time the whole iteration, until the generator is exhausted or
+        closed, and count the yielded items as the payload
+        """
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            failed = True
+            count = 0
+            try:
+                for item in func(*args, **kwargs):
+                    count += 1
+                    yield item
+                failed = False
+            except GeneratorExit:
+                failed = False
+                raise
+            finally:
+                self._observe(name, time.perf_counter() - start, count, failed)
+        wrapper.__wrapped_by_metrics__ = func
+        return wrapper
+
+
+    def instrument(self, cls):
+        for attr, value in list(vars(cls).items()):
+            if attr.startswith("_") or not inspect.isfunction(value):
+                continue
+            if hasattr(value, "__wrapped_by_metrics__"):
+                continue
+            setattr(cls, attr, self._wrap(f"{cls.__module__.rsplit('.', 1)[-1]}.{cls.__name__}.{attr}", value))
+            self._patched.append((cls, attr, value))
+
+
+    def enable(self, classes=None):
+        """
+        instrument classes, by default every public SDK class
+        """
+        if classes is None:
+            classes = default_classes()
+        for cls in classes:
+            self.instrument(cls)
+
+
+    def disable(self):
+        while self._patched:
+            cls, attr, value = self._patched.pop()
+            setattr(cls, attr, value)
+
+
+    def reset(self):
+        with self._lock:
+            self.metrics.clear()
+
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {name: metric.to_dict() for name, metric in sorted(self.metrics.items())}
+
+
+    def to_prometheus(self) -> str:
+        lines = [
+            "# TYPE manjaro_sdk_call_seconds histogram",
+            "# TYPE manjaro_sdk_call_errors_total counter",
+            "# TYPE manjaro_sdk_payload_items_total counter"
+        ]
+        for name, metric in self.to_dict().items():
+            label = f'method="{name}"'
+            count = 0
+            for bound, value in metric["buckets"].items():
+                count += value
+                lines.append(f'manjaro_sdk_call_seconds_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f"manjaro_sdk_call_seconds_sum{{{label}}} {metric['total_seconds']}")
+            lines.append(f"manjaro_sdk_call_seconds_count{{{label}}} {metric['calls']}")
+            lines.append(f"manjaro_sdk_call_errors_total{{{label}}} {metric['errors']}")
+            lines.append(f"manjaro_sdk_payload_items_total{{{label}}} {metric['payload_items']}")
+        return "\n".join(lines) + "\n"
+
+
+def default_classes():
+    from Manjaro.SDK.PackageManager import Pamac
+    from Manjaro.SDK.Packages import Package
+    from Manjaro.SDK.Snaps import Snap
+    from Manjaro.SDK.Flatpaks import Flatpak
+    from Manjaro.SDK.Appimages import Appimage
+    from Manjaro.SDK.Branches import Branch
+    from Manjaro.SDK.Hardware import Info
+    return (Pamac, Package, Snap, Flatpak, Appimage, Branch, Info)
+
+
+registry = Registry()
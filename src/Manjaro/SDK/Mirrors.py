@@ -0,0 +1,200 @@
+import json, os, threading, time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from http import client
+from urllib.parse import urlsplit
+from Manjaro.SDK import Utils
+
+
+Probe = namedtuple("Probe", ["url", "ttfb", "throughput", "received", "error"])
+
+
+def read_mirrorlist(path="/etc/pacman.d/mirrorlist"):
+    """
+    return the branch roots of the servers in a pacman mirrorlist
+    """
+    mirrors = []
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                key, _, value = line.partition("=")
+                if key.strip() == "Server" and value.strip():
+                    url = value.strip().split("/$repo", 1)[0]
+                    if url not in mirrors:
+                        mirrors.append(url)
+    except OSError:
+        pass
+    return mirrors
+
+
+class MirrorRanker():
+    """
+    probes mirrors concurrently, measuring time to first byte and the
+    throughput of a small file, and keeps decaying scores on disk so the
+    ranking improves across runs. lower scores are better: the estimated
+    seconds to fetch reference_size bytes from the mirror.
+    """
+    def __init__(self, mirrors=(), path=None, probe_file="state", timeout=5, max_workers=8,
+                 probe_size=256 * 1024, reference_size=1024 * 1024, smoothing=0.5, half_life=24 * 60 * 60):
+        self.mirrors = list(mirrors)
+        self.path = path or os.path.join(Utils.get_cache_dir(create=False), "mirror-rankings.json")
+        self.probe_file = probe_file
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.probe_size = probe_size
+        self.reference_size = reference_size
+        self.smoothing = smoothing
+        self.half_life = half_life
+        self._connections = {}
+        self._lock = threading.Lock()
+
+
+    def _get_connection(self, scheme, netloc, timeout):
+        with self._lock:
+            idle = self._connections.get((scheme, netloc))
+            if idle:
+                conn = idle.pop()
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn
+        if scheme == "https":
+            return client.HTTPSConnection(netloc, timeout=timeout)
+        return client.HTTPConnection(netloc, timeout=timeout)
+
+
+    def _release_connection(self, scheme, netloc, conn):
+        with self._lock:
+            self._connections.setdefault((scheme, netloc), []).append(conn)
+
+
+    def close(self):
+        with self._lock:
+            for idle in self._connections.values():
+                for conn in idle:
+                    conn.close()
+            self._connections.clear()
+
+
+    def probe(self, url, deadline=None) -> Probe:
+        """
+        fetch up to probe_size bytes of the probe file from url before the deadline
+        """
+        start = time.monotonic()
+        deadline = min(deadline or start + self.timeout, start + self.timeout)
+        parts = urlsplit(f"{url.rstrip('/')}/{self.probe_file}")
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        conn = None
+        try:
+            conn = self._get_connection(parts.scheme, parts.netloc, max(deadline - start, 0.001))
+            conn.request("GET", path, headers={"Range": f"bytes=0-{self.probe_size - 1}"})
+            response = conn.getresponse()
+            ttfb = time.monotonic() - start
+            if response.status not in (200, 206):
+                response.read()
+                raise client.HTTPException(f"HTTP {response.status}")
+
+            received = 0
+            first = time.monotonic()
+            while received < self.probe_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                conn.sock.settimeout(remaining)
+                chunk = response.read1(min(64 * 1024, self.probe_size - received))
+                if not chunk:
+                    break
+                received += len(chunk)
+            elapsed = time.monotonic() - first
+
+            if response.length == 0:
+                response.read()
+            if not response.will_close and response.isclosed():
+                self._release_connection(parts.scheme, parts.netloc, conn)
+            else:
+                conn.close()
+            throughput = received / elapsed if elapsed > 0 else float(received)
+            return Probe(url, ttfb, throughput, received, None)
+        except (OSError, client.HTTPException) as e:
+            if conn is not None:
+                conn.close()
+            return Probe(url, None, None, 0, str(e) or type(e).__name__)
+
+
+    def probe_all(self, mirrors=None, timeout=None) -> list:
+        """
+        probe every mirror concurrently, all probes share one deadline
+        """
+        mirrors = list(mirrors if mirrors is not None else self.mirrors)
+        if not mirrors:
+            return []
+        deadline = time.monotonic() + (timeout or self.timeout)
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(mirrors))) as pool:
+            return list(pool.map(lambda url: self.probe(url, deadline), mirrors))
+
+
+    def get_cost(self, probe):
+        if probe.error is not None or not probe.throughput:
+            return self.timeout * 2
+        return probe.ttfb + self.reference_size / probe.throughput
+
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+
+    def _save(self, state):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+
+
+    def update(self, probes) -> dict:
+        """
+        blend probe results into the stored scores. previous scores keep
+        smoothing of their weight, halved for every half_life of age.
+        """
+        now = time.time()
+        state = self._load()
+        for probe in probes:
+            cost = self.get_cost(probe)
+            previous = state.get(probe.url)
+            if previous is not None:
+                weight = self.smoothing * 0.5 ** (max(now - previous["time"], 0) / self.half_life)
+                cost = weight * previous["score"] + (1 - weight) * cost
+            state[probe.url] = {
+                "score": cost,
+                "time": now,
+                "ttfb": probe.ttfb,
+                "throughput": probe.throughput,
+                "error": probe.error
+            }
+        self._save(state)
+        return state
+
+
+    def get_rankings(self, mirrors=None) -> list:
+        """
+        return mirrors ordered by their stored score without probing,
+        mirrors that were never probed come last
+        """
+        state = self._load()
+        mirrors = list(mirrors if mirrors is not None else (self.mirrors or state))
+        known = [url for url in mirrors if url in state]
+        known.sort(key=lambda url: state[url]["score"])
+        return known + [url for url in mirrors if url not in state]
+
+
+    def rank(self, mirrors=None, timeout=None) -> list:
+        """
+        probe the mirrors, update the stored scores and return them best first
+        """
+        mirrors = list(mirrors if mirrors is not None else self.mirrors)
+        self.update(self.probe_all(mirrors, timeout))
+        return self.get_rankings(mirrors)
@@ -1,23 +1,129 @@
-import os, subprocess
+import os, shlex, threading
+from types import MappingProxyType
+from Manjaro.SDK.Branches import Branch
 
 
 class Info():
+    """
+    operating system facts read in process. release files are parsed
+    directly and kept in a snapshot that is rebuilt when one of them changes.
+    """
+    def __init__(self, root="/"):
+        self.root = root
+        self._snapshot = None
+        self._mtimes = None
+        self._lock = threading.Lock()
 
-    def __init__(self):
-        self.inv_variables = self.get_inv_variables()
 
-    def get_inv_variables(self) -> dict: 
-        output = subprocess.check_output("printenv", shell=True)
-        dict = {}
-        s = output.decode('utf-8').splitlines()
-        for i in s:
-            split = i.split("=", 1)
-            dict[split[0]] = str(split[1])          
-        return dict
+    @property
+    def inv_variables(self) -> dict:
+        return self.get_inv_variables()
+
+
+    def get_inv_variables(self) -> dict:
+        return dict(os.environ)
+
+
+    def _path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+
+    def _files(self):
+        return (
+            self._path("etc", "os-release"),
+            self._path("usr", "lib", "os-release"),
+            self._path("etc", "lsb-release"),
+            self._path("etc", "pacman-mirrors.conf")
+        )
+
+
+    def _get_mtimes(self):
+        mtimes = []
+        for path in self._files():
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+
+    def _parse_release(self, path) -> dict:
+        data = {}
+        try:
+            with open(path, "r") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line or line.startswith("#") or "=" not in line:
+                        continue
+                    key, value = line.split("=", 1)
+                    try:
+                        value = " ".join(shlex.split(value))
+                    except ValueError:
+                        value = value.strip("\"'")
+                    data[key.strip()] = value
+        except OSError:
+            pass
+        return data
+
+
+    def _read_kernel(self):
+        try:
+            with open(self._path("proc", "sys", "kernel", "osrelease"), "r") as f:
+                return f.read().strip()
+        except OSError:
+            return os.uname().release if self.root == "/" else None
+
+
+    def _build(self):
+        os_release_path, usr_os_release_path, lsb_release_path, mirrors_config = self._files()
+        os_release = self._parse_release(os_release_path) or self._parse_release(usr_os_release_path)
+        lsb_release = self._parse_release(lsb_release_path)
+        branch = None
+        if os.path.exists(mirrors_config):
+            branch = Branch(mirrors_config).get_branch()
+        return MappingProxyType({
+            "kernel": self._read_kernel(),
+            "name": os_release.get("NAME") or lsb_release.get("DISTRIB_ID"),
+            "release": os_release.get("VERSION_ID") or lsb_release.get("DISTRIB_RELEASE"),
+            "codename": os_release.get("VERSION_CODENAME") or lsb_release.get("DISTRIB_CODENAME"),
+            "branch": branch,
+            "os_release": MappingProxyType(os_release),
+            "lsb_release": MappingProxyType(lsb_release)
+        })
+
+
+    def snapshot(self):
+        """
+        return the os facts, rebuilt only when a release file changed
+        """
+        mtimes = self._get_mtimes()
+        with self._lock:
+            if self._snapshot is None or mtimes != self._mtimes:
+                self._snapshot = self._build()
+                self._mtimes = mtimes
+            return self._snapshot
+
+
+    def get_os_release(self) -> dict:
+        return dict(self.snapshot()["os_release"])
+
+
+    def get_lsb_release(self) -> dict:
+        return dict(self.snapshot()["lsb_release"])
+
 
     def get_lsb_version(self):
-        lsb = subprocess.Popen(["lsb_release"], shell=True)
-        return lsb.replace("LSB Version:", "").trim()
+        lsb = self.snapshot()["lsb_release"]
+        return lsb.get("LSB_VERSION") or lsb.get("DISTRIB_RELEASE")
+
+
+    def get_kernel(self):
+        return self.snapshot()["kernel"]
+
+
+    def get_release(self):
+        return self.snapshot()["release"]
+
 
-    
-    
+    def get_branch(self):
+        return self.snapshot()["branch"]
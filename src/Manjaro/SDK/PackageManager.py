@@ -1,4 +1,5 @@
-import gi
+import gi, threading, time
+from concurrent.futures import Future, as_completed, TimeoutError as FutureTimeoutError
 try:
     gi.require_version('Pamac', '11')
 except Exception as e:
@@ -8,6 +9,15 @@ from Manjaro.SDK.Snaps import Snap
 from Manjaro.SDK.Flatpaks import Flatpak
 from Manjaro.SDK.Packages import Package
 from Manjaro.SDK.Appimages import Appimage
+from Manjaro.SDK.Cache import ResultCache, get_dir_signature
+from Manjaro.SDK.Worker import QueryWorker
+from Manjaro.SDK import Telemetry
+from Manjaro.SDK.Snapshot import CatalogSnapshot
+from Manjaro.SDK.Details import get_app_names
+
+
+def _pkg_key(pkg):
+    return pkg if isinstance(pkg, str) else pkg.get_name()
 
 
 class Pamac():
@@ -23,6 +33,12 @@ class Pamac():
         self.db = pamac.Database(config=self.config)
         self.config.set_enable_aur(options["aur"])
         self.data = None
+        self.telemetry = Telemetry.TransactionStats()
+        self.events = Telemetry.EventStream(self.on_event)
+        self.cache = ResultCache()
+        self.sync_path = "/var/lib/pacman/sync"
+        self._sync_signature = get_dir_signature(self.sync_path)
+        self.snapshot = CatalogSnapshot(sync_path=self.sync_path)
         self.package = Package(self)
         self.snap = Snap(self)
         self.flatpak = Flatpak(self)
@@ -32,59 +48,268 @@ class Pamac():
         self.transaction.connect("emit-action-progress", self._on_emit_action_progress, self.data)
         self.transaction.connect("emit-hook-progress", self._on_emit_hook_progress, self.data)
         self.transaction.connect("emit-error", self.on_emit_error, self.data)
+        try:
+            self.transaction.connect("emit-download-progress", self._on_emit_download_progress, self.data)
+        except TypeError:
+            pass
         self.transaction.connect("emit-warning", self.on_emit_warning, self.data)
         self.loop = GLib.MainLoop()
+        self.worker = None
+        if options.get("threaded"):
+            self.worker = QueryWorker(self)
+            self.worker.start()
+
+
+    def close(self):
+        """
+        stop the query worker in threaded mode
+        """
+        if self.worker is not None:
+            self.worker.stop()
+
+
+    def _submit(self, func, *args):
+        """
+        run a blocking libpamac call on the worker thread in threaded mode
+        """
+        if self.worker is not None:
+            return self.worker.submit(func, *args).result()
+        return func(*args)
 
 
     def search_flatpaks(self, pkg: str) -> list:
+        if self.worker is not None:
+            return self.worker.search_flatpaks(pkg).result()
         return self.flatpak.search(pkg)
 
 
     def search_snaps(self, pkg: str) -> list:
-        return self.snap.search(pkg)   
+        if self.worker is not None:
+            return self.worker.search_snaps(pkg).result()
+        return self.snap.search(pkg)
 
 
     def search_pkgs(self, pkg: str) -> list:
-        return self.package.search(pkg)
+        if self.worker is not None:
+            return self._cached(("search_pkgs", pkg), lambda: self.worker.search_pkgs(pkg).result())
+        return self._cached(("search_pkgs", pkg), lambda: self.package.search(pkg))
+
+
+    def search_all(self, pkg: str, timeout=None, formats=("packages", "snaps", "flatpaks", "appimages")):
+        """
+        search every format concurrently and yield a dict with the format,
+        its results and the elapsed seconds as soon as each backend answers.
+        backends that did not answer within timeout seconds are dropped.
+        """
+        if self.worker is not None:
+            yield from self._search_all_worker(pkg, timeout, formats)
+            return
+
+        start = time.monotonic()
+        context = GLib.MainContext.default()
+        ready = []
+        pending = set(formats) & {"packages", "snaps", "flatpaks", "appimages"}
+        expired = []
+
+        def done(pkg_format, pkgs):
+            if pkg_format in pending:
+                pending.discard(pkg_format)
+                ready.append({
+                    "format": pkg_format,
+                    "results": tuple(pkgs),
+                    "elapsed": time.monotonic() - start
+                })
+            return False
+
+        def finish(pkg_format, method):
+            def callback(source_object, result, data):
+                try:
+                    pkgs = getattr(source_object, method)(result)
+                except GLib.GError as e:
+                    print("Error: ", e.message)
+                    pkgs = ()
+                done(pkg_format, pkgs)
+            return callback
+
+        def search_appimages():
+            pkgs = ()
+            try:
+                pkgs = self.appimage.search(pkg)
+            except Exception as e:
+                print("Error: ", e)
+            finally:
+                GLib.idle_add(done, "appimages", pkgs)
+
+        def on_timeout():
+            expired.append(True)
+            return False
+
+        if "packages" in pending:
+            self.db.search_pkgs_async(pkg, finish("packages", "search_pkgs_finish"), None)
+        if "snaps" in pending:
+            self.db.search_snaps_async(pkg, finish("snaps", "search_snaps_finish"), None)
+        if "flatpaks" in pending:
+            self.db.search_flatpaks_async(pkg, finish("flatpaks", "search_flatpaks_finish"), None)
+        if "appimages" in pending:
+            threading.Thread(target=search_appimages, daemon=True).start()
+
+        timeout_id = None
+        if timeout is not None:
+            timeout_id = GLib.timeout_add(int(timeout * 1000), on_timeout)
+
+        try:
+            while pending and not expired:
+                context.iteration(True)
+                while ready:
+                    yield ready.pop(0)
+            while ready:
+                yield ready.pop(0)
+        finally:
+            if timeout_id is not None and not expired:
+                GLib.source_remove(timeout_id)
+
+
+    def _search_all_worker(self, pkg, timeout, formats):
+        start = time.monotonic()
+        futures = {}
+        if "packages" in formats:
+            futures[self.worker.search_pkgs_async(pkg)] = "packages"
+        if "snaps" in formats:
+            futures[self.worker.search_snaps(pkg)] = "snaps"
+        if "flatpaks" in formats:
+            futures[self.worker.search_flatpaks(pkg)] = "flatpaks"
+        if "appimages" in formats:
+            future = Future()
+            def search_appimages():
+                try:
+                    future.set_result(self.appimage.search(pkg))
+                except Exception as e:
+                    future.set_exception(e)
+            threading.Thread(target=search_appimages, daemon=True).start()
+            futures[future] = "appimages"
+
+        try:
+            for future in as_completed(futures, timeout):
+                try:
+                    pkgs = future.result()
+                except GLib.GError as e:
+                    print("Error: ", e.message)
+                    pkgs = ()
+                except Exception as e:
+                    print("Error: ", e)
+                    pkgs = ()
+                yield {
+                    "format": futures[future],
+                    "results": tuple(pkgs),
+                    "elapsed": time.monotonic() - start
+                }
+        except FutureTimeoutError:
+            return
+
+
+    def _cached(self, key, func, keep=None):
+        signature = get_dir_signature(self.sync_path)
+        if signature != self._sync_signature:
+            self._sync_signature = signature
+            self.cache.clear()
+        return self.cache.get_or_set(key, func, keep)
+
+
+    def _cached_details(self, key, func):
+        """
+        cache found details only and hand every caller its own copy
+        """
+        details = self._cached(key, func, keep=bool)
+        return details.copy() if details else details
+
+
+    def cache_stats(self) -> dict:
+        """
+        return result cache size, hits, misses and evictions
+        """
+        return self.cache.stats()
 
 
     def get_app_name(self, pkg: str) -> str:
         """
         return application name if available otherwise returns pkg name.
         """
-        return self.package.get_name(pkg)
+        return self._submit(self.package.get_name, pkg)
+
+
+    def get_app_names_many(self, pkgs: list, pkg_format="packages") -> dict:
+        """
+        return application names for a list of packages in one pass,
+        None for packages that could not be found.
+        :param pkg_format: packages/snaps/flatpaks
+        """
+        if pkg_format == "snaps":
+            if self.worker is not None:
+                return get_app_names(self.get_snaps_details_many(pkgs))
+            return self.snap.get_app_names_many(pkgs)
+        elif pkg_format == "flatpaks":
+            if self.worker is not None:
+                return get_app_names(self.get_flatpaks_details_many(pkgs))
+            return self.flatpak.get_app_names_many(pkgs)
+        return self._submit(self.package.get_app_names_many, pkgs)
 
 
     def get_pkg_details(self, pkg):
-        return self.package.get_details(pkg)
+        if self.worker is not None:
+            return self._cached_details(("get_pkg_details", pkg), lambda: self.worker.get_pkg_details(pkg).result())
+        return self._cached_details(("get_pkg_details", pkg), lambda: self.package.get_details(pkg))
 
 
     def get_snap_details(self, pkg):
-        return self.snap.get_details(pkg)
+        if self.worker is not None:
+            return self._cached_details(("get_snap_details", pkg), lambda: self.worker.get_snap_details(pkg).result())
+        return self._cached_details(("get_snap_details", pkg), lambda: self.snap.get_details(pkg))
 
 
     def get_flatpak_details(self, pkg):
+        if self.worker is not None:
+            return self.worker.get_flatpak_details(pkg).result()
         return self.flatpak.get_details(pkg)
 
 
+    def get_pkgs_details_many(self, pkgs: list) -> dict:
+        if self.worker is not None:
+            return self.worker.get_pkgs_details_many(pkgs).result()
+        return self.package.get_details_many(pkgs)
+
+
+    def get_snaps_details_many(self, pkgs: list) -> dict:
+        if self.worker is not None:
+            return self.worker.get_snaps_details_many(pkgs).result()
+        return self.snap.get_details_many(pkgs)
+
+
+    def get_flatpaks_details_many(self, pkgs: list) -> dict:
+        if self.worker is not None:
+            return self.worker.get_flatpaks_details_many(pkgs).result()
+        return self.flatpak.get_details_many(pkgs)
+
+
     def get_repos(self) -> list:
         """
         return repositories names
         """
-        return self.db.get_repos_names()
+        return self._submit(self.db.get_repos_names)
 
 
     def get_categories(self) -> list:
         """
         return categories names
         """
-        return self.db.get_categories_names()
+        return list(self._cached("get_categories", lambda: tuple(self._submit(self.db.get_categories_names))))
 
 
     def get_all_pkgs(self) -> list:
         """
         return all available native packages
         """
+        if self.worker is not None:
+            return self.worker.get_all_pkgs().result()
         return self.package.get_available()
 
 
@@ -92,6 +317,8 @@ class Pamac():
         """
         return all available snaps
         """
+        if self.worker is not None:
+            return self.worker.get_all_snaps().result()
         return self.snap.get_available()
 
 
@@ -99,6 +326,8 @@ class Pamac():
         """
         return all available flatpaks
         """
+        if self.worker is not None:
+            return self.worker.get_all_flatpaks().result()
         return self.flatpak.get_available()
 
 
@@ -109,6 +338,58 @@ class Pamac():
         return self.appimage.get_available()
 
 
+    def refresh_snapshot(self, background=True):
+        """
+        rebuild the stale formats of the on-disk catalog snapshot. it runs in
+        the background only in threaded mode, where snap and flatpak queries
+        go through the worker; otherwise it refreshes synchronously.
+        """
+        formats = self.snapshot.get_stale_formats()
+        if formats:
+            return self.snapshot.refresh(self, formats, background=background and self.worker is not None)
+
+
+    def refresh_catalogs(self, formats=("packages", "snaps", "flatpaks", "appimages")) -> dict:
+        """
+        reload the package databases, fetch the catalogs again and compare
+        them with the snapshot by name and version. returns the added,
+        removed and updated names per format and updates the snapshot,
+        appimage indexes and result cache in place.
+        """
+        getters = {
+            "packages": self.get_all_pkgs,
+            "snaps": self.get_all_snaps,
+            "flatpaks": self.get_all_flatpaks
+        }
+        if "packages" in formats:
+            # libpamac answers from its loaded databases until they are reloaded
+            if self.worker is not None:
+                self.worker.submit(self.db.refresh).result()
+            else:
+                self.db.refresh()
+
+        changes = {}
+        for pkg_format in formats:
+            if pkg_format == "appimages":
+                self.appimage.refresh()
+                pkgs = self.appimage.db
+            else:
+                pkgs = getters[pkg_format]()
+            changes[pkg_format] = self.snapshot.update(pkg_format, pkgs)
+            self._invalidate(pkg_format, changes[pkg_format])
+        return changes
+
+
+    def _invalidate(self, pkg_format, changes):
+        names = set(changes["added"] + changes["removed"] + changes["updated"])
+        if not names:
+            return
+        if pkg_format == "packages":
+            self.cache.discard_if(lambda key: key[0] == "search_pkgs" or (key[0] == "get_pkg_details" and key[1] in names))
+        elif pkg_format == "snaps":
+            self.cache.discard_if(lambda key: key[0] == "get_snap_details" and key[1] in names)
+
+
     def add_pkgs_to_install(self, pkgs: list, pkg_format="packages"):
         """
         add packages to installation list
@@ -155,7 +436,7 @@ class Pamac():
         """
         return a list of all installed packages
         """
-        return self.package.get_installed()
+        return self._submit(self.package.get_installed)
 
 
     def on_msg_emit(self, action=None, progress=None, status=None, details=[], message=None):
@@ -168,23 +449,41 @@ class Pamac():
                 #print(msg)
 
 
+    def on_event(self, event):
+        """
+        receives typed Telemetry events, to be reimplemented to stream them
+        elsewhere; by default they feed the telemetry aggregator
+        """
+        self.telemetry.add(event)
+
+
     def on_emit_action(self, transaction, action, data):
+        self.events.action(action)
         self.on_msg_emit(action=action)
 
 
     def _on_emit_action_progress(self, transaction, action, status, progress, data):
+       self.events.action_progress(action, status, progress)
        self.on_msg_emit(action=action, status=status, progress=progress)
 
 
+    def _on_emit_download_progress(self, transaction, action, status, progress, data):
+        self.events.action_progress(action, status, progress)
+        self.on_msg_emit(action=action, status=status, progress=progress)
+
+
     def _on_emit_hook_progress(self, transaction, action, details, status, progress, data):
+        self.events.hook_progress(action, details, status, progress)
         self.on_msg_emit(action=action, details=details, status=status)
 
 
     def on_emit_warning(self, transaction, message, data):
+        self.events.warning(message)
         self.on_msg_emit(message=message)
 
 
     def on_emit_error(self, transaction, message, details, data):
+	    self.events.error(message, details)
 	    self.on_msg_emit(message=message, details=details)
         
     
@@ -203,47 +502,112 @@ class Pamac():
             if success:
                 pass
         finally:
+            self.events.finish()
+            self.cache.clear()
             self.loop.quit()
             self.transaction.quit_daemon()
             self.on_transaction_finish()
 
 
-    def _run_transaction(self):
-        self.transaction.set_dry_run(self.options["dry_run"])
+    def _is_installed(self, pkg_format, pkg):
+        if pkg_format == "packages":
+            return self.db.is_installed_pkg(pkg)
+        elif pkg_format in ("snaps", "flatpaks") and not isinstance(pkg, str):
+            return bool(pkg.get_installed_version())
+        return None
 
+
+    def plan_transaction(self) -> dict:
+        """
+        return the work the next transaction will submit, per format.
+        duplicates are dropped, installing installed packages and removing
+        packages that are not installed are skipped, and packages queued
+        for both install and remove are reported as conflicts. with upgrade
+        only installed packages with a different sync version are upgraded.
+        """
+        plan = {}
+        backends = {
+            "packages": self.package,
+            "snaps": self.snap,
+            "flatpaks": self.flatpak,
+            "appimages": self.appimage
+        }
+        for pkg_format, backend in backends.items():
+            install = {_pkg_key(pkg): pkg for pkg in backend.install}
+            remove = {_pkg_key(pkg): pkg for pkg in backend.remove}
+            conflicts = tuple(name for name in install if name in remove)
+            skipped = []
+            for name, pkg in list(install.items()):
+                if name not in remove and self._is_installed(pkg_format, pkg) is True:
+                    skipped.append(name)
+                    del install[name]
+            for name, pkg in list(remove.items()):
+                if name not in install and self._is_installed(pkg_format, pkg) is False:
+                    skipped.append(name)
+                    del remove[name]
+            plan[pkg_format] = {
+                "install": tuple(install.values()),
+                "remove": tuple(remove.values()),
+                "skipped": tuple(skipped),
+                "conflicts": conflicts
+            }
+
+        plan["upgrade"] = ()
         if self.options["upgrade"]:
-            self.transaction.add_pkgs_to_upgrade(self.get_installed_pkgs())
-                
-        if self.package.install:
-            for pkg in self.package.install:
-                self.transaction.add_pkg_to_install(pkg)
+            removed = set(plan["packages"]["remove"])
+            plan["upgrade"] = tuple(pkg for pkg in self.package.get_upgradable() if pkg not in removed)
+        return plan
 
-        if self.snap.install:
-            for pkg in self.snap.install:
-                self.transaction.add_snap_to_install(pkg)
 
-        if self.flatpak.install:
-            for pkg in self.flatpak.install:
-                self.transaction.add_flatpak_to_install(pkg)
+    def _prepare_transaction(self):
+        """
+        submit the planned work to the transaction,
+        returns False without submitting anything when the plan has conflicts
+        """
+        plan = self.plan_transaction()
+        conflicts = []
+        for pkg_format in ("packages", "snaps", "flatpaks", "appimages"):
+            conflicts.extend(plan[pkg_format]["conflicts"])
+        if conflicts:
+            self.on_msg_emit(message="Error: packages queued for both install and remove", details=conflicts)
+            return False
+
+        self.telemetry.reset()
+        self.events.start()
+        self.transaction.set_dry_run(self.options["dry_run"])
+
+        if plan["upgrade"]:
+            self.transaction.add_pkgs_to_upgrade(plan["upgrade"])
+
+        for pkg in plan["packages"]["install"]:
+            self.transaction.add_pkg_to_install(pkg)
 
-        if self.appimage.install:
+        for pkg in plan["snaps"]["install"]:
+            self.transaction.add_snap_to_install(pkg)
+
+        for pkg in plan["flatpaks"]["install"]:
+            self.transaction.add_flatpak_to_install(pkg)
+
+        if plan["appimages"]["install"]:
             self.appimage.transaction_install()
 
-        if self.appimage.remove:
+        if plan["appimages"]["remove"]:
             self.appimage.transaction_remove()
 
-        if self.package.remove:
-            for pkg in self.package.remove:
-                self.transaction.add_pkg_to_remove(pkg)
+        for pkg in plan["packages"]["remove"]:
+            self.transaction.add_pkg_to_remove(pkg)
 
-        if self.snap.remove:
-            for pkg in self.snap.remove:
-                self.transaction.add_snap_to_remove(pkg)
+        for pkg in plan["snaps"]["remove"]:
+            self.transaction.add_snap_to_remove(pkg)
 
-        if self.flatpak.remove:
-            for pkg in self.flatpak.remove:
-                self.transaction.add_flatpak_to_remove(pkg)
+        for pkg in plan["flatpaks"]["remove"]:
+            self.transaction.add_flatpak_to_remove(pkg)
+        return True
 
+
+    def _run_transaction(self):
+        if not self._prepare_transaction():
+            return
         self.transaction.run_async(self.on_transaction_finished_callback, None)
         self.loop.run()
 
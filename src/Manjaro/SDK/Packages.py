@@ -1,4 +1,42 @@
 from Manjaro.SDK import Utils
+from Manjaro.SDK.Details import LazyDetails
+
+
+DETAILS = {
+    "format": lambda p: "package",
+    "files": lambda p: p.get_files(),
+    "app_id": lambda p: p.get_app_id(),
+    "title": lambda p: p.get_app_name(),
+    "backups": lambda p: p.get_backups(),
+    "build_date": lambda p: Utils.glib_date_to_string(p.get_build_date()),
+    "check_depends": lambda p: p.get_checkdepends(),
+    "conflits": lambda p: p.get_conflicts(),
+    "depends": lambda p: p.get_depends(),
+    "description": lambda p: p.get_desc(),
+    "download_size": lambda p: Utils.convert_bytes_to_human(p.get_download_size()),
+    "groups": lambda p: p.get_groups(),
+    "icon": lambda p: p.get_icon(),
+    "pkg_id": lambda p: p.get_id(),
+    "install_date": lambda p: Utils.glib_date_to_string(p.get_install_date()),
+    "installed_size": lambda p: Utils.convert_bytes_to_human(p.get_installed_size()),
+    "installed_version": lambda p: p.get_installed_version(),
+    "launchable": lambda p: p.get_launchable(),
+    "license": lambda p: p.get_license(),
+    "long_description": lambda p: p.get_long_desc(),
+    "makedepends": lambda p: p.get_makedepends(),
+    "name": lambda p: p.get_name(),
+    "optdepends": lambda p: p.get_optdepends(),
+    "optionalfor": lambda p: p.get_optionalfor(),
+    "packager": lambda p: p.get_packager(),
+    "provides": lambda p: p.get_provides(),
+    "reason": lambda p: p.get_reason() or None,
+    "replaces": lambda p: p.get_replaces(),
+    "repository": lambda p: p.get_repo(),
+    "required_by": lambda p: p.get_requiredby(),
+    "screenshots": lambda p: p.get_screenshots(),
+    "url": lambda p: p.get_url(),
+    "version": lambda p: p.get_version(),
+}
 
 
 class Package():
@@ -17,19 +55,39 @@ class Package():
 
     
     def get_name(self, pkg):
-        name = self.pm.db.get_pkg(pkg).get_app_name()
-        if not name:
-            name = self.pm.db.get_pkg(pkg).get_name()
-        return name
+        p = self.pm.db.get_pkg(pkg)
+        return p.get_app_name() or p.get_name()
+
 
+    def get_app_names_many(self, pkgs):
+        """
+        return a dict of package name to application name,
+        None for packages that do not exist
+        """
+        names = {}
+        for pkg in pkgs:
+            p = self.pm.db.get_pkg(pkg)
+            names[pkg] = (p.get_app_name() or p.get_name()) if p is not None else None
+        return names
 
-    def get_available(self, db=[]):
+
+    def iter_available(self):
+        """
+        yield available packages repo by repo. repositories are walked in
+        get_repos() order, so a package found in an earlier repository
+        shadows packages with the same name in later ones.
+        """
+        seen = set()
         for repo in self.pm.get_repos():
-            repository = self.pm.db.get_repo_pkgs(repo)
-            for pkg in repository:
-                if pkg.get_name() not in (p.get_name() for p in db):
-                    db.append(pkg)
-        return tuple(db)
+            for pkg in self.pm.db.get_repo_pkgs(repo):
+                name = pkg.get_name()
+                if name not in seen:
+                    seen.add(name)
+                    yield pkg
+
+
+    def get_available(self):
+        return tuple(self.iter_available())
 
     
     def get_installed(self):
@@ -39,42 +97,32 @@ class Package():
         return tuple(pkgs)
 
 
+    def get_upgradable(self):
+        """
+        return the names of installed packages whose sync version differs
+        from the installed one
+        """
+        pkgs = []
+        for pkg in self.pm.db.get_installed_pkgs():
+            name = pkg.get_name()
+            sync = self.pm.db.get_sync_pkg(name)
+            if sync is not None and sync.get_version() != pkg.get_version():
+                pkgs.append(name)
+        return tuple(pkgs)
+
+
     def get_details(self, pkg):
         p = self.pm.db.get_pkg(pkg)
-        info = {}
-        info["format"] = "package"
-        info["files"] = p.get_files()
-        info["app_id"] = p.get_app_id()
-        info["title"] = p.get_app_name()
-        info["backups"] = p.get_backups()
-        info["build_date"] = Utils.glib_date_to_string(p.get_build_date())
-        info["check_depends"] = p.get_checkdepends()
-        info["conflits"] = p.get_conflicts()
-        info["depends"] = p.get_depends()
-        info["description"] = p.get_desc()
-        info["download_size"] = Utils.convert_bytes_to_human(p.get_download_size())
-        info["groups"] = p.get_groups()
-        info["icon"] = p.get_icon()
-        info["pkg_id"] = p.get_id()
-        info["install_date"] = Utils.glib_date_to_string(p.get_install_date())
-        info["installed_size"] = Utils.convert_bytes_to_human(p.get_installed_size())
-        info["installed_version"] = p.get_installed_version()
-        info["launchable"] = p.get_launchable()
-        info["license"] = p.get_license()
-        info["long_description"] = p.get_long_desc()
-        info["makedepends"] = p.get_makedepends()
-        info["name"] = p.get_name()
-        info["optdepends"] = p.get_optdepends()
-        info["optionalfor"] = p.get_optionalfor()
-        info["packager"] = p.get_packager()
-        info["provides"] = p.get_provides()
-        info["reason"] = None
-        if p.get_reason():
-            info["reason"] = p.get_reason()
-        info["replaces"] = p.get_replaces()
-        info["repository"] = p.get_repo()
-        info["required_by"] = p.get_requiredby()
-        info["screenshots"] = p.get_screenshots()
-        info["url"] = p.get_url()
-        info["version"] = p.get_version()
-        return info
\ No newline at end of file
+        return LazyDetails(p, DETAILS) if p is not None else {}
+
+
+    def get_details_many(self, pkgs):
+        """
+        return a dict of package name to details,
+        None for packages that do not exist
+        """
+        details = {}
+        for pkg in pkgs:
+            p = self.pm.db.get_pkg(pkg)
+            details[pkg] = LazyDetails(p, DETAILS) if p is not None else None
+        return details
\ No newline at end of file
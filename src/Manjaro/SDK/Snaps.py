@@ -1,6 +1,33 @@
 import gi
 from gi.repository import GLib
 from Manjaro.SDK import Utils
+from Manjaro.SDK.Details import LazyDetails, get_app_names
+
+
+DETAILS = {
+    "format": lambda p: "snap",
+    "app_id": lambda p: p.get_app_id(),
+    "title": lambda p: p.get_app_name(),
+    "channel": lambda p: p.get_channel(),
+    "channels": lambda p: p.get_channels(),
+    "confined": lambda p: p.get_confined(),
+    "description": lambda p: p.get_desc(),
+    "download_size": lambda p: Utils.convert_bytes_to_human(p.get_download_size()),
+    "icon": lambda p: p.get_icon(),
+    "id": lambda p: p.get_id(),
+    "install_date": lambda p: Utils.glib_date_to_string(p.get_install_date()),
+    "installed_size": lambda p: Utils.convert_bytes_to_human(p.get_installed_size()),
+    "installed_version": lambda p: p.get_installed_version(),
+    "launchable": lambda p: p.get_launchable(),
+    "license": lambda p: p.get_license(),
+    "long_description": lambda p: p.get_long_desc(),
+    "name": lambda p: p.get_name(),
+    "publisher": lambda p: p.get_publisher(),
+    "repository": lambda p: p.get_repo(),
+    "screenshots": lambda p: p.get_screenshots(),
+    "url": lambda p: p.get_url(),
+    "version": lambda p: p.get_version(),
+}
 
 class Snap():
     def __init__(self, pm_instance):
@@ -40,54 +67,76 @@ class Snap():
             except GLib.GError as e:
                 print("Error: ", e.message)
             else:
-                try:
-                    info["format"] = "snap"
-                    info["app_id"] = p.get_app_id()
-                    info["title"] = p.get_app_name()
-                    info["channel"] = p.get_channel()
-                    info["channels"] = p.get_channels()
-                    info["confined"] = p.get_confined()
-                    info["description"] = p.get_desc()
-                    info["download_size"] = Utils.convert_bytes_to_human(p.get_download_size())
-                    info["icon"] = p.get_icon()
-                    info["id"] = p.get_id()
-                    info["install_date"] = Utils.glib_date_to_string(p.get_install_date())
-                    info["installed_size"] = Utils.convert_bytes_to_human(p.get_installed_size())
-                    info["installed_version"] = p.get_installed_version()
-                    info["launchable"] = p.get_launchable()
-                    info["license"] = p.get_license()
-                    info["long_description"] = p.get_long_desc()
-                    info["name"] = p.get_name()
-                    info["publisher"] = p.get_publisher()
-                    info["repository"] = p.get_repo()
-                    info["screenshots"] = p.get_screenshots()
-                    info["url"] = p.get_url()
-                    info["version"] = p.get_version()
-                except AttributeError as e:
-                    print(e)
+                if p is not None:
+                    info["details"] = LazyDetails(p, DETAILS)
             finally:
                 self.pm.loop.quit()
 
         self.pm.db.get_snap_async(pkg, callback)
         self.pm.loop.run()
-        return info
+        return info.get("details", {})
+
 
-    def get_available(self, db=[]):
-        def on_category_ready(source_object, result):
+    def get_details_many(self, pkgs):
+        """
+        request all snaps at once and return a dict of name to details,
+        None for snaps that could not be found
+        """
+        pkgs = list(dict.fromkeys(pkgs))
+        details = {}
+
+        def callback(source_object, result, pkg):
             try:
-                pkgs = source_object.get_category_snaps_finish(result)
+                p = source_object.get_snap_finish(result)
             except GLib.GError as e:
                 print("Error: ", e.message)
-            else:
-                for pkg in pkgs:
-                    if pkg.get_name() not in (p.get_name() for p in db):
-                        db.append(pkg)
-            finally:
+                p = None
+            details[pkg] = LazyDetails(p, DETAILS) if p is not None else None
+            if len(details) == len(pkgs):
                 self.pm.loop.quit()
 
-        for category in self.pm.get_categories():
-            if category !="Featured":
-                self.pm.db.get_category_snaps_async(category, on_category_ready)
-                self.pm.loop.run()
+        for pkg in pkgs:
+            self.pm.db.get_snap_async(pkg, callback, pkg)
+
+        if pkgs:
+            self.pm.loop.run()
+
+        return {pkg: details[pkg] for pkg in pkgs}
+
+
+    def get_app_names_many(self, pkgs):
+        """
+        return a dict of snap name to application name,
+        None for snaps that could not be found
+        """
+        return get_app_names(self.get_details_many(pkgs))
+
+
+    def get_available(self):
+        """
+        request every category at once and collect them in a single loop run
+        """
+        categories = [c for c in self.pm.get_categories() if c != "Featured"]
+        results = {}
+
+        def on_category_ready(source_object, result, category):
+            try:
+                results[category] = source_object.get_category_snaps_finish(result)
+            except GLib.GError as e:
+                print("Error: ", e.message)
+                results[category] = ()
+            finally:
+                if len(results) == len(categories):
+                    self.pm.loop.quit()
+
+        for category in categories:
+            self.pm.db.get_category_snaps_async(category, on_category_ready, category)
+
+        if categories:
+            self.pm.loop.run()
 
-        return tuple(db)
\ No newline at end of file
+        db = {}
+        for category in categories:
+            for pkg in results[category]:
+                db.setdefault(pkg.get_name(), pkg)
+        return tuple(db.values())
\ No newline at end of file
@@ -0,0 +1,210 @@
+import json, os, sqlite3, threading, time
+from collections.abc import Mapping
+from Manjaro.SDK import Utils
+from Manjaro.SDK.Cache import get_dir_signature
+
+
+FORMATS = ("packages", "snaps", "flatpaks", "appimages")
+GETTERS = {
+    "packages": "get_all_pkgs",
+    "snaps": "get_all_snaps",
+    "flatpaks": "get_all_flatpaks",
+    "appimages": "get_all_appimages"
+}
+FIELDS = ("format", "name", "version", "title", "description", "icon")
+
+
+def get_entry(pkg_format, pkg):
+    """
+    return the snapshot row for a libpamac package object or a catalog mapping
+    """
+    if isinstance(pkg, Mapping):
+        return (pkg_format, pkg["name"], pkg.get("version"), pkg.get("title"),
+                pkg.get("description"), pkg.get("icon"))
+    return (pkg_format, pkg.get_name(), pkg.get_version(), pkg.get_app_name(),
+            pkg.get_desc(), pkg.get_icon())
+
+
+class CatalogSnapshot():
+    """
+    the merged catalog of every format in one SQLite file. it is opened
+    lazily on first use and keyed to the sync database mtimes so a stale
+    snapshot can be detected and refreshed in the background.
+    """
+    def __init__(self, path=None, sync_path="/var/lib/pacman/sync"):
+        self._path = path
+        self.sync_path = sync_path
+        self._local = threading.local()
+        self._refresh = None
+
+
+    @property
+    def path(self):
+        if self._path is None:
+            self._path = os.path.join(Utils.get_cache_dir(create=False), "catalog.sqlite")
+        return self._path
+
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = self._local.conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "format TEXT, name TEXT, version TEXT, title TEXT, description TEXT, icon TEXT, "
+                "PRIMARY KEY (format, name)) WITHOUT ROWID"
+            )
+        return conn
+
+
+    def _get_meta(self, key):
+        row = self._connect().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+    def _signature(self):
+        return [list(entry) for entry in get_dir_signature(self.sync_path)]
+
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path) and self._get_meta("created") is not None
+
+
+    def get_stale_formats(self, formats=FORMATS) -> list:
+        """
+        return the formats that were never written or whose sync databases
+        changed since they were written
+        """
+        if not os.path.exists(self.path):
+            return list(formats)
+        signature = self._signature()
+        return [f for f in formats if self._get_meta(f"signature:{f}") != signature]
+
+
+    def is_stale(self, formats=FORMATS) -> bool:
+        """
+        return True when any of formats is missing from the snapshot or stale
+        """
+        return bool(self.get_stale_formats(formats))
+
+
+    def _stamp(self, conn, formats):
+        signature = json.dumps(self._signature())
+        conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", ((f"signature:{f}", signature) for f in formats))
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('created', ?)", (json.dumps(time.time()),))
+
+
+    def write(self, catalogs: dict):
+        """
+        replace the snapshot of each format in catalogs, a dict of format
+        to packages, and mark only those formats as fresh
+        """
+        conn = self._connect()
+        with conn:
+            for pkg_format, pkgs in catalogs.items():
+                conn.execute("DELETE FROM entries WHERE format = ?", (pkg_format,))
+                conn.executemany(
+                    "INSERT OR IGNORE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                    (get_entry(pkg_format, pkg) for pkg in pkgs)
+                )
+            self._stamp(conn, catalogs)
+
+
+    def update(self, pkg_format, pkgs) -> dict:
+        """
+        compare pkgs with the snapshot of pkg_format, write only the rows
+        that changed and return the added, removed and updated names.
+        an entry counts as updated when its version or metadata changed.
+        """
+        rows = {}
+        for pkg in pkgs:
+            row = get_entry(pkg_format, pkg)
+            rows.setdefault(row[1], row)
+
+        conn = self._connect()
+        old = {row[1]: row for row in conn.execute("SELECT * FROM entries WHERE format = ?", (pkg_format,))}
+        changes = {
+            "added": [name for name in rows if name not in old],
+            "removed": [name for name in old if name not in rows],
+            "updated": [name for name, row in rows.items() if name in old and old[name] != row]
+        }
+        with conn:
+            conn.executemany(
+                "DELETE FROM entries WHERE format = ? AND name = ?",
+                ((pkg_format, name) for name in changes["removed"])
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (rows[name] for name in changes["added"] + changes["updated"])
+            )
+            self._stamp(conn, (pkg_format,))
+        return changes
+
+
+    def get(self, pkg_format, name):
+        row = self._connect().execute(
+            "SELECT * FROM entries WHERE format = ? AND name = ?", (pkg_format, name)
+        ).fetchone()
+        return dict(zip(FIELDS, row)) if row else None
+
+
+    def iter_entries(self, pkg_format=None):
+        if pkg_format is None:
+            cursor = self._connect().execute("SELECT * FROM entries")
+        else:
+            cursor = self._connect().execute("SELECT * FROM entries WHERE format = ?", (pkg_format,))
+        for row in cursor:
+            yield dict(zip(FIELDS, row))
+
+
+    def count(self, pkg_format=None) -> int:
+        if pkg_format is None:
+            return self._connect().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return self._connect().execute("SELECT COUNT(*) FROM entries WHERE format = ?", (pkg_format,)).fetchone()[0]
+
+
+    def search(self, value, pkg_format=None, limit=None) -> list:
+        """
+        return entries whose name, title or description contain value,
+        name matches first and shorter names before longer ones
+        """
+        pattern = "%" + value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        query = (
+            "SELECT *, CASE WHEN name LIKE :p ESCAPE '\\' THEN 0 "
+            "WHEN title LIKE :p ESCAPE '\\' THEN 1 ELSE 2 END AS rank FROM entries "
+            "WHERE (name LIKE :p ESCAPE '\\' OR title LIKE :p ESCAPE '\\' OR description LIKE :p ESCAPE '\\')"
+        )
+        params = {"p": pattern, "format": pkg_format, "limit": -1 if limit is None else limit}
+        if pkg_format is not None:
+            query += " AND format = :format"
+        query += " ORDER BY rank, length(name), name LIMIT :limit"
+        return [dict(zip(FIELDS, row)) for row in self._connect().execute(query, params)]
+
+
+    def refresh(self, pm_instance, formats=FORMATS, background=True):
+        """
+        rebuild the snapshot from a Pamac instance. in the background a
+        single refresh runs at a time and its thread is returned. only run
+        it in the background with a threaded Pamac, otherwise snap and
+        flatpak queries would spin the caller's loop from another thread.
+        """
+        def run():
+            self.write({pkg_format: getattr(pm_instance, GETTERS[pkg_format])() for pkg_format in formats})
+
+        if not background:
+            run()
+            return None
+        if self._refresh is None or not self._refresh.is_alive():
+            self._refresh = threading.Thread(target=run, name="catalog-snapshot", daemon=True)
+            self._refresh.start()
+        return self._refresh
+
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -0,0 +1,205 @@
+import re, time
+from collections import namedtuple
+
+
+PhaseStart = namedtuple("PhaseStart", ["time", "phase", "action"])
+PhaseEnd = namedtuple("PhaseEnd", ["time", "phase", "duration"])
+DownloadProgress = namedtuple("DownloadProgress", ["time", "action", "received", "total", "progress", "rate"])
+HookProgress = namedtuple("HookProgress", ["time", "action", "details", "status", "progress"])
+WarningEvent = namedtuple("WarningEvent", ["time", "message"])
+ErrorEvent = namedtuple("ErrorEvent", ["time", "message", "details"])
+
+
+PACKAGE_ACTIONS = ("Installing", "Reinstalling", "Upgrading", "Downgrading", "Removing", "Configuring")
+UNITS = {"b": 1, "kb": 1024, "kib": 1024, "mb": 1024 ** 2, "mib": 1024 ** 2, "gb": 1024 ** 3, "gib": 1024 ** 3}
+_size = re.compile(r"([\d.,]+)\s*([kmg]i?b|b(?:ytes?)?)", re.IGNORECASE)
+
+
+def get_phase(action):
+    """
+    return the phase an action belongs to, per package actions such as
+    "Installing gimp (2.10-1)..." are grouped under their verb
+    """
+    action = action.strip().rstrip(".").strip()
+    verb = action.split(" ", 1)[0]
+    if verb in PACKAGE_ACTIONS:
+        return verb
+    return action
+
+
+def parse_size(text):
+    match = _size.fullmatch(text.strip())
+    if match is None:
+        return None
+    unit = match.group(2).lower()
+    if unit.startswith("byte"):
+        unit = "b"
+    try:
+        return int(float(match.group(1).replace(",", ".")) * UNITS[unit])
+    except ValueError:
+        return None
+
+
+def parse_download_status(status):
+    """
+    return received and total bytes from a "1.2 MB/3.4 MB" status string
+    """
+    if not status or "/" not in status:
+        return None, None
+    received, total = status.split("/", 1)
+    received, total = parse_size(received), parse_size(total)
+    if received is None or total is None:
+        return None, None
+    return received, total
+
+
+class EventStream():
+    """
+    turns transaction signals into typed events with monotonic timestamps
+    and hands them to sink
+    """
+    def __init__(self, sink):
+        self.sink = sink
+        self.phase = None
+        self._phase_start = None
+        self._last_download = None
+
+
+    def start(self):
+        self.phase = None
+        self._phase_start = None
+        self._last_download = None
+
+
+    def _enter(self, phase, action, now):
+        if phase == self.phase:
+            return
+        self._leave(now)
+        self.phase = phase
+        self._phase_start = now
+        self.sink(PhaseStart(now, phase, action))
+
+
+    def _leave(self, now):
+        if self.phase is not None:
+            self.sink(PhaseEnd(now, self.phase, now - self._phase_start))
+            self.phase = None
+
+
+    def action(self, action):
+        if action:
+            self._enter(get_phase(action), action, time.monotonic())
+
+
+    def action_progress(self, action, status, progress):
+        now = time.monotonic()
+        received, total = parse_download_status(status)
+        if received is None:
+            return
+        self._enter("Downloading", action, now)
+        rate = None
+        if self._last_download is not None:
+            last_time, last_received = self._last_download
+            if now > last_time and received >= last_received:
+                rate = (received - last_received) / (now - last_time)
+        self._last_download = (now, received)
+        self.sink(DownloadProgress(now, action, received, total, progress, rate))
+
+
+    def hook_progress(self, action, details, status, progress):
+        now = time.monotonic()
+        self._enter(get_phase(action), action, now)
+        self.sink(HookProgress(now, action, details, status, progress))
+
+
+    def warning(self, message):
+        self.sink(WarningEvent(time.monotonic(), message))
+
+
+    def error(self, message, details):
+        self.sink(ErrorEvent(time.monotonic(), message, details))
+
+
+    def finish(self):
+        self._leave(time.monotonic())
+
+
+class TransactionStats():
+    """
+    aggregates events into per phase durations, hook timings,
+    download throughput and an ETA for the running download
+    """
+    def __init__(self):
+        self.reset()
+
+
+    def reset(self):
+        self.events = []
+        self.phases = {}
+        self.hooks = {}
+        self.errors = []
+        self.downloaded = 0
+        self.download_total = None
+        self._download_start = None
+        self._download_time = None
+        self._download_progress = None
+        self._hook = None
+
+
+    def add(self, event):
+        self.events.append(event)
+        if isinstance(event, PhaseEnd):
+            self.phases[event.phase] = self.phases.get(event.phase, 0) + event.duration
+            self._end_hook(event.time)
+        elif isinstance(event, DownloadProgress):
+            if self._download_start is None:
+                self._download_start = event.time
+            self._download_time = event.time
+            self._download_progress = event.progress
+            self.downloaded = event.received
+            self.download_total = event.total
+        elif isinstance(event, HookProgress):
+            if self._hook is None or self._hook[0] != event.details:
+                self._end_hook(event.time)
+                self._hook = (event.details, event.time)
+        elif isinstance(event, ErrorEvent):
+            self.errors.append(event)
+
+
+    def _end_hook(self, now):
+        if self._hook is not None:
+            details, start = self._hook
+            self.hooks[details] = self.hooks.get(details, 0) + now - start
+            self._hook = None
+
+
+    def throughput(self):
+        """
+        return the average download rate in bytes per second
+        """
+        if self._download_start is None or self._download_time <= self._download_start:
+            return None
+        return self.downloaded / (self._download_time - self._download_start)
+
+
+    def eta(self):
+        """
+        return the estimated seconds left for the running download
+        """
+        progress = self._download_progress
+        if not progress or self._download_start is None:
+            return None
+        elapsed = self._download_time - self._download_start
+        return elapsed * (1 - progress) / progress
+
+
+    def summary(self) -> dict:
+        return {
+            "phases": dict(self.phases),
+            "hooks": dict(self.hooks),
+            "downloaded": self.downloaded,
+            "download_total": self.download_total,
+            "throughput": self.throughput(),
+            "eta": self.eta(),
+            "errors": [e.message for e in self.errors]
+        }
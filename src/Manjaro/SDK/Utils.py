@@ -1,4 +1,7 @@
+import os
 import re
+import json
+import codecs
 import threading
 import multiprocessing
 
@@ -11,10 +14,188 @@ def glib_date_to_string(date):
     return d
 
 
+def get_cache_dir(create=True):
+    """
+    return the SDK cache directory, following the XDG base directory spec,
+    creating it unless create is False
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    path = os.path.join(base, "manjaro-sdk")
+    if create:
+        os.makedirs(path, exist_ok=True)
+    return path
+
+
+_html_tags = re.compile('<.*?>')
+_whitespace = re.compile(r'[ \t\n\r]*')
+_delimiters = frozenset(" \t\n\r,:]}")
+_json = json.JSONDecoder()
+
+
 def strip_html(html):
-        regex = re.compile('<.*?>')
-        text = re.sub(regex, '', html)
-        return text
+        return _html_tags.sub('', html)
+
+
+class _JsonStream():
+    def __init__(self, fp, chunk_size):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+
+
+    def _fill(self):
+        data = self.fp.read(self.chunk_size)
+        self.buffer = self.buffer[self.pos:] + self.decoder.decode(data, final=not data)
+        self.pos = 0
+        return bool(data)
+
+
+    def peek(self):
+        while True:
+            self.pos = _whitespace.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r} at offset {self.pos}")
+        self.pos += 1
+
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _json.raw_decode(self.buffer, self.pos)
+            except ValueError:
+                if not self._fill():
+                    raise
+                continue
+            if end == len(self.buffer) and self._fill():
+                continue
+            # a number can be cut at the chunk boundary after a prefix that
+            # decodes on its own, like "1." or "12.5e", so wait for a delimiter
+            if (isinstance(value, (int, float)) and not isinstance(value, bool)
+                    and end < len(self.buffer) and self.buffer[end] not in _delimiters
+                    and self._fill()):
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_array(fp, key, chunk_size=64 * 1024):
+    """
+    yield the elements of the key array of the JSON object in fp one by
+    one, without loading the whole document
+    """
+    stream = _JsonStream(fp, chunk_size)
+    stream.expect("{")
+    while stream.peek() != "}":
+        name = stream.value()
+        stream.expect(":")
+        if name != key:
+            stream.value()
+        else:
+            stream.expect("[")
+            while stream.peek() != "]":
+                yield stream.value()
+                if stream.peek() == ",":
+                    stream.pos += 1
+                elif stream.peek() != "]":
+                    raise ValueError(f"expected ',' or ']' at offset {stream.pos}")
+            return
+        if stream.peek() == ",":
+            stream.pos += 1
+
+
+class SearchIndex():
+    """
+    trigram index over a few normalized text fields per key.
+    matches are substring matches, ranked by the first field that
+    matches and then by insertion order.
+    """
+    def __init__(self):
+        self._fields = {}
+        self._order = {}
+        self._grams = {}
+        self._count = 0
+
+
+    @staticmethod
+    def normalize(text):
+        return " ".join(str(text).lower().split()) if text else ""
+
+
+    @staticmethod
+    def _trigrams(text):
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+    def add(self, key, *fields):
+        if key in self._fields:
+            self.remove(key)
+        fields = tuple(self.normalize(f) for f in fields)
+        self._fields[key] = fields
+        self._order[key] = self._count
+        self._count += 1
+        grams = self._grams
+        for gram in set().union(*map(self._trigrams, fields)):
+            keys = grams.get(gram)
+            if keys is None:
+                grams[gram] = {key}
+            else:
+                keys.add(key)
+
+
+    def remove(self, key):
+        fields = self._fields.pop(key, None)
+        if fields is None:
+            return
+        del self._order[key]
+        for gram in set().union(*map(self._trigrams, fields)):
+            keys = self._grams.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._grams[gram]
+
+
+    def __len__(self):
+        return len(self._fields)
+
+
+    def search(self, value, limit=None):
+        value = self.normalize(value)
+        if len(value) < 3:
+            candidates = self._fields
+        else:
+            postings = []
+            for gram in self._trigrams(value):
+                keys = self._grams.get(gram)
+                if not keys:
+                    return []
+                postings.append(keys)
+            postings.sort(key=len)
+            candidates = postings[0].intersection(*postings[1:])
+
+        ranked = {}
+        for key in candidates:
+            for rank, field in enumerate(self._fields[key]):
+                if value in field:
+                    ranked.setdefault(rank, []).append(key)
+                    break
+
+        result = []
+        for rank in sorted(ranked):
+            result.extend(sorted(ranked[rank], key=self._order.__getitem__))
+            if limit is not None and len(result) >= limit:
+                return result[:limit]
+        return result
 
 
 def convert_bytes_to_human(bytes):
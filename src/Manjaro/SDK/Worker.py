@@ -0,0 +1,216 @@
+import threading
+from concurrent.futures import Future
+from gi.repository import GLib
+from Manjaro.SDK import Snaps, Flatpaks
+from Manjaro.SDK.Details import LazyDetails, resolve
+
+
+class QueryWorker():
+    """
+    a dedicated thread that owns its own GLib main context. requests from
+    any thread are queued onto that context and answered through
+    concurrent futures, so async libpamac calls from many callers are
+    pipelined through one loop instead of racing on loop.run()/quit().
+    """
+    def __init__(self, pm_instance):
+        self.pm = pm_instance
+        self.context = GLib.MainContext.new()
+        self.loop = GLib.MainLoop.new(self.context, False)
+        self._thread = threading.Thread(target=self._run, name="pamac-worker", daemon=True)
+        self._started = threading.Event()
+
+
+    def _run(self):
+        self.context.push_thread_default()
+        try:
+            self._started.set()
+            self.loop.run()
+        finally:
+            self.context.pop_thread_default()
+
+
+    def start(self):
+        if not self._thread.is_alive():
+            self._thread.start()
+            self._started.wait()
+
+
+    def stop(self):
+        self.context.invoke_full(GLib.PRIORITY_DEFAULT, self._quit)
+        self._thread.join()
+
+
+    def _quit(self):
+        self.loop.quit()
+        return False
+
+
+    def _invoke(self, func, future):
+        def dispatch():
+            if future.set_running_or_notify_cancel():
+                try:
+                    func(future)
+                except Exception as e:
+                    future.set_exception(e)
+            return False
+
+        self.context.invoke_full(GLib.PRIORITY_DEFAULT, dispatch)
+        return future
+
+
+    def submit(self, func, *args) -> Future:
+        """
+        run a blocking call on the worker thread
+        """
+        def start(future):
+            future.set_result(func(*args))
+        return self._invoke(start, Future())
+
+
+    def call(self, source, method, *args, finish) -> Future:
+        """
+        start source.method(*args) on the worker context and resolve the
+        returned future with source.finish(result)
+        """
+        def start(future):
+            def callback(source_object, result, data):
+                try:
+                    future.set_result(getattr(source_object, finish)(result))
+                except GLib.GError as e:
+                    future.set_exception(e)
+            getattr(source, method)(*args, callback, None)
+        return self._invoke(start, Future())
+
+
+    def _then(self, future, func):
+        result = Future()
+        def done(f):
+            try:
+                result.set_result(func(f.result()))
+            except Exception as e:
+                result.set_exception(e)
+        future.add_done_callback(done)
+        return result
+
+
+    def _call_many(self, method, finish, pkgs, resolve) -> Future:
+        """
+        start method for every name in pkgs at once and resolve the future
+        with a dict of name to resolve(result), None for missing results.
+        objects that are not names are resolved as they are. resolve runs
+        on the worker thread, so package getters never run on callers.
+        """
+        pkgs = list(dict.fromkeys(pkgs))
+
+        def start(future):
+            results = {}
+
+            def complete():
+                if len(results) == len(pkgs) and not future.done():
+                    future.set_result({pkg: results[pkg] for pkg in pkgs})
+
+            def callback(source_object, result, pkg):
+                if future.done():
+                    return
+                try:
+                    p = getattr(source_object, finish)(result)
+                except GLib.GError as e:
+                    print("Error: ", e.message)
+                    p = None
+                try:
+                    results[pkg] = resolve(p) if p is not None else None
+                except Exception as e:
+                    future.set_exception(e)
+                    return
+                complete()
+
+            for pkg in pkgs:
+                if isinstance(pkg, str):
+                    getattr(self.pm.db, method)(pkg, callback, pkg)
+                else:
+                    results[pkg] = resolve(pkg)
+            complete()
+
+        return self._invoke(start, Future())
+
+
+    def search_pkgs(self, pkg) -> Future:
+        return self.submit(self.pm.package.search, pkg)
+
+
+    def search_pkgs_async(self, pkg) -> Future:
+        return self._then(self.call(self.pm.db, "search_pkgs_async", pkg, finish="search_pkgs_finish"), tuple)
+
+
+    def search_snaps(self, pkg) -> Future:
+        return self._then(self.call(self.pm.db, "search_snaps_async", pkg, finish="search_snaps_finish"), tuple)
+
+
+    def search_flatpaks(self, pkg) -> Future:
+        return self._then(self.call(self.pm.db, "search_flatpaks_async", pkg, finish="search_flatpaks_finish"), tuple)
+
+
+    def get_pkg_details(self, pkg) -> Future:
+        return self.submit(lambda: resolve(self.pm.package.get_details(pkg)))
+
+
+    def get_pkgs_details_many(self, pkgs) -> Future:
+        def details():
+            return {pkg: resolve(p) for pkg, p in self.pm.package.get_details_many(pkgs).items()}
+        return self.submit(details)
+
+
+    def get_snaps_details_many(self, pkgs) -> Future:
+        return self._call_many("get_snap_async", "get_snap_finish", pkgs,
+                               lambda p: LazyDetails(p, Snaps.DETAILS).resolve())
+
+
+    def get_flatpaks_details_many(self, pkgs) -> Future:
+        return self._call_many("get_flatpak_async", "get_flatpak_finish", pkgs,
+                               lambda p: LazyDetails(p, Flatpaks.DETAILS).resolve())
+
+
+    def get_snap_details(self, pkg) -> Future:
+        return self._then(self.get_snaps_details_many([pkg]), lambda details: details[pkg] or {})
+
+
+    def get_flatpak_details(self, pkg) -> Future:
+        return self._then(self.get_flatpaks_details_many([pkg]), lambda details: details[pkg] or {})
+
+
+    def _get_categories(self, kind) -> Future:
+        def start(future):
+            categories = [c for c in self.pm.db.get_categories_names() if c != "Featured"]
+            results = {}
+
+            def callback(source_object, result, category):
+                try:
+                    results[category] = getattr(source_object, f"get_category_{kind}_finish")(result)
+                except GLib.GError as e:
+                    print("Error: ", e.message)
+                    results[category] = ()
+                if len(results) == len(categories):
+                    db = {}
+                    for c in categories:
+                        for pkg in results[c]:
+                            db.setdefault(pkg.get_name(), pkg)
+                    future.set_result(tuple(db.values()))
+
+            for category in categories:
+                getattr(self.pm.db, f"get_category_{kind}_async")(category, callback, category)
+            if not categories:
+                future.set_result(())
+
+        return self._invoke(start, Future())
+
+
+    def get_all_pkgs(self) -> Future:
+        return self.submit(self.pm.package.get_available)
+
+
+    def get_all_snaps(self) -> Future:
+        return self._get_categories("snaps")
+
+
+    def get_all_flatpaks(self) -> Future:
+        return self._get_categories("flatpaks")
@@ -1,4 +1,7 @@
 import unittest
+from unittest import mock
+import asyncio, io, os, sys, json, tempfile, threading, time
+from http.server import HTTPServer, ThreadingHTTPServer, BaseHTTPRequestHandler
 try:
     from Manjaro.SDK import PackageManager
 except Exception as e:
@@ -19,6 +22,71 @@ try:
 except Exception as e:
     print(e)
 
+try:
+    from Manjaro.SDK import Appimages
+except Exception as e:
+    print(e)
+
+try:
+    from Manjaro.SDK import Packages
+except Exception as e:
+    print(e)
+
+try:
+    from Manjaro.SDK import Cache
+except Exception as e:
+    print(e)
+
+try:
+    from Manjaro.SDK import Utils
+except Exception as e:
+    print(e)
+
+try:
+    from Manjaro.SDK import Telemetry
+except Exception as e:
+    print(e)
+
+try:
+    from Manjaro.SDK import Metrics
+except Exception as e:
+    print(e)
+
+try:
+    from Manjaro.SDK import Snapshot
+except Exception as e:
+    print(e)
+
+try:
+    from Manjaro.SDK import Mirrors
+except Exception as e:
+    print(e)
+
+try:
+    from Manjaro.SDK import Worker
+    from gi.repository import GLib
+except Exception as e:
+    print(e)
+
+try:
+    from Manjaro.SDK import AsyncPackageManager
+except Exception as e:
+    print(e)
+
+
+def serve(handler):
+    server = HTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+FEED = {"items": [
+    {"name": "Foo_App", "links": [{"url": "foo/foo"}], "license": "MIT",
+     "description": "<p>Foo image editor</p>", "icons": ["foo.png"]},
+    {"name": "Bar", "links": [{"url": "bar/bar"}], "license": None,
+     "description": "Bar player, plays foo files", "icons": None},
+]}
+
 class TestBranches(unittest.TestCase):
 
     def test_get_branch(self):
@@ -27,12 +95,126 @@ class TestBranches(unittest.TestCase):
         print(f"test get branch done!")
 
 
+class TestBranchSwitch(unittest.TestCase):
+    def test_cached_branch(self):
+        path = os.path.join(tempfile.mkdtemp(), "pacman-mirrors.conf")
+        with open(path, "w") as f:
+            f.write("Branch = testing\n")
+        i = Branches.Branch(path)
+        self.assertEqual(i.get_branch(), "testing")
+        i._branch = "cached"
+        self.assertEqual(i.get_branch(), "cached")
+        with open(path, "w") as f:
+            f.write("Branch = unstable\n")
+        os.utime(path, ns=(0, 0))
+        self.assertEqual(i.get_branch(), "unstable")
+        print(f"test cached branch done!")
+
+    def test_set_branch_mirrors(self):
+        script = "import sys, time; print('ranking'); sys.stdout.flush(); time.sleep(0.3); print(sys.argv[-1]); sys.exit(sys.argv[-1] == 'broken')"
+        i = Branches.Branch(command=[sys.executable, "-c", script])
+        lines = []
+        first = i.set_branch_mirrors("testing", on_progress=lambda s, line: lines.append(line))
+        self.assertIs(i.set_branch_mirrors("testing"), first)
+        second = i.set_branch_mirrors("unstable")
+        self.assertIs(i.set_branch_mirrors("broken"), second)
+        self.assertEqual(first.wait(5), 0)
+        self.assertTrue(first.success)
+        self.assertGreater(first.elapsed, 0.2)
+        self.assertEqual(lines, ["ranking", "testing"])
+        self.assertEqual(second.wait(5), 1)
+        self.assertEqual(second.output, ["ranking", "broken"])
+        print(f"test set branch mirrors done!")
+
+    def test_failing_callback(self):
+        i = Branches.Branch(command=[sys.executable, "-c", "print('ranking'); print('done')"])
+        def broken(switch, line):
+            raise RuntimeError("callback failed")
+        first = i.set_branch_mirrors("testing", on_progress=broken)
+        first.on_done(lambda switch: 1 / 0)
+        self.assertEqual(first.wait(5), 0)
+        self.assertEqual(first.output, ["ranking", "done"])
+        second = i.set_branch_mirrors("stable")
+        self.assertIsNot(second, first)
+        self.assertEqual(second.wait(5), 0)
+        print(f"test failing mirror callback done!")
+
+
+class TestMirrors(unittest.TestCase):
+    def mirror(self, latency, body=b"x" * 4096):
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            def do_GET(self):
+                time.sleep(latency)
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            def log_message(self, *args):
+                pass
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return f"http://127.0.0.1:{server.server_port}/manjaro/stable"
+
+    def test_rank(self):
+        fast = self.mirror(0)
+        slow = self.mirror(0.2)
+        stuck = self.mirror(2)
+        path = os.path.join(tempfile.mkdtemp(), "rankings.json")
+        ranker = Mirrors.MirrorRanker([stuck, slow, fast], path=path, timeout=0.8)
+        self.addCleanup(ranker.close)
+        start = time.monotonic()
+        self.assertEqual(ranker.rank(), [fast, slow, stuck])
+        self.assertLess(time.monotonic() - start, 1.5)
+        probe = ranker.probe(fast)
+        self.assertIsNone(probe.error)
+        self.assertEqual(probe.received, 4096)
+        self.assertEqual(sum(len(c) for c in ranker._connections.values()), 2)
+        self.assertEqual(Mirrors.MirrorRanker(path=path).get_rankings(), [fast, slow, stuck])
+        print(f"test rank mirrors done!")
+
+    def test_read_mirrorlist(self):
+        path = os.path.join(tempfile.mkdtemp(), "mirrorlist")
+        with open(path, "w") as f:
+            f.write("## Country : Germany\nServer = https://a.org/manjaro/stable/$repo/$arch\n"
+                    "Server = https://b.org/stable/$repo/$arch\n")
+        self.assertEqual(Mirrors.read_mirrorlist(path), ["https://a.org/manjaro/stable", "https://b.org/stable"])
+        print(f"test read mirrorlist done!")
+
+
 class TestOsInfo(unittest.TestCase):
     def test_env_variables(self):
         i = Os.Info().get_inv_variables()
         self.assertIsInstance(i, dict)
         print(f"test env variables done!")
 
+    def test_fake_root(self):
+        root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(root, "etc"))
+        os.makedirs(os.path.join(root, "proc/sys/kernel"))
+        with open(os.path.join(root, "etc/os-release"), "w") as f:
+            f.write('NAME="Manjaro Linux"\nID=manjaro\n# comment\nPRETTY_NAME="Manjaro Linux"\n')
+        with open(os.path.join(root, "etc/lsb-release"), "w") as f:
+            f.write('DISTRIB_ID="ManjaroLinux"\nDISTRIB_RELEASE="23.0.0"\nDISTRIB_CODENAME="Uranos"\n')
+        with open(os.path.join(root, "etc/pacman-mirrors.conf"), "w") as f:
+            f.write("Branch = testing\n")
+        with open(os.path.join(root, "proc/sys/kernel/osrelease"), "w") as f:
+            f.write("6.1.1-1-MANJARO\n")
+        i = Os.Info(root)
+        self.assertEqual(i.get_kernel(), "6.1.1-1-MANJARO")
+        self.assertEqual(i.get_release(), "23.0.0")
+        self.assertEqual(i.get_os_release()["NAME"], "Manjaro Linux")
+        self.assertEqual(i.snapshot()["codename"], "Uranos")
+        self.assertEqual(i.get_branch(), "testing")
+        self.assertIs(i.snapshot(), i.snapshot())
+        with open(os.path.join(root, "etc/os-release"), "a") as f:
+            f.write("VERSION_ID=24.0\n")
+        os.utime(os.path.join(root, "etc/os-release"), ns=(0, 0))
+        self.assertEqual(i.get_release(), "24.0")
+        print(f"test os fake root done!")
+
 
 class TestHardwareInfo(unittest.TestCase):
     def test_virtual_machine(self):
@@ -40,6 +222,794 @@ class TestHardwareInfo(unittest.TestCase):
         self.assertIsInstance(i, bool)
         print(f"test virtual machine done!")
 
+    def test_fake_sysfs(self):
+        root = tempfile.mkdtemp()
+        def write(path, value):
+            path = os.path.join(root, path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(value + "\n")
+        for slot, cls, vendor, device in (("0000:00:02.0", "0x030000", "0x8086", "0x9bc4"),
+                                          ("0000:00:1f.3", "0x040300", "0x8086", "0x02c8")):
+            for name, value in (("class", cls), ("vendor", vendor), ("device", device),
+                                ("subsystem_vendor", "0x1028"), ("subsystem_device", "0x09be")):
+                write(f"sys/bus/pci/devices/{slot}/{name}", value)
+        os.makedirs(os.path.join(root, "sys/bus/pci/drivers/i915"))
+        os.symlink(os.path.join(root, "sys/bus/pci/drivers/i915"), os.path.join(root, "sys/bus/pci/devices/0000:00:02.0/driver"))
+        write("proc/cpuinfo", "processor\t: 0\nvendor_id\t: GenuineIntel\nmodel name\t: Intel Core\nflags\t\t: fpu sse\n\n"
+                              "processor\t: 1\nvendor_id\t: GenuineIntel\n")
+        write("sys/class/dmi/id/sys_vendor", "Dell Inc.")
+        i = Hardware.Info(root)
+        self.assertEqual(len(i.get_pci_devices()), 2)
+        self.assertEqual(i.get_gpus()[0].class_id, "0300")
+        self.assertEqual(i.get_gpus()[0].vendor_id, "8086")
+        self.assertEqual(i.graphics_driver(), ("i915",))
+        self.assertEqual(i.get_cpu().threads, 2)
+        self.assertEqual(i.get_cpu().model, "Intel Core")
+        self.assertFalse(i.is_virtual_machine())
+        self.assertIs(i.snapshot(), i.snapshot())
+        write("sys/class/dmi/id/sys_vendor", "QEMU")
+        self.assertFalse(i.is_virtual_machine())
+        i.refresh()
+        self.assertEqual(i.get_virtualization(), "qemu")
+        print(f"test fake sysfs done!")
+
+
+class FakePkg():
+    def __init__(self, name, repo):
+        self.name = name
+        self.repo = repo
+        self.files_calls = 0
+
+    def get_name(self):
+        return self.name
+
+    def get_repo(self):
+        return self.repo
+
+    def get_app_name(self):
+        return self.name.capitalize() if self.repo == "extra" else ""
+
+    def get_version(self):
+        return "1.0"
+
+    def get_desc(self):
+        return f"{self.name} description"
+
+    def get_icon(self):
+        return None
+
+    def get_files(self):
+        self.files_calls += 1
+        return [f"/usr/bin/{self.name}"]
+
+    def __getattr__(self, attr):
+        if not attr.startswith("get_"):
+            raise AttributeError(attr)
+        return lambda: 0 if attr.endswith("_size") else None
+
+
+class FakeDatabase():
+    def __init__(self, repos, installed={}):
+        self.repos = repos
+        self.installed = installed
+
+    def get_repo_pkgs(self, repo):
+        return [FakePkg(name, repo) for name in self.repos[repo]]
+
+    def get_pkg(self, name):
+        for repo, names in self.repos.items():
+            if name in names:
+                return FakePkg(name, repo)
+
+    get_sync_pkg = get_pkg
+
+    def get_repos_names(self):
+        return list(self.repos)
+
+    def is_installed_pkg(self, name):
+        return name in self.installed
+
+    def get_installed_pkgs(self):
+        pkgs = []
+        for name, version in self.installed.items():
+            pkg = FakePkg(name, "local")
+            pkg.get_version = lambda version=version: version
+            pkgs.append(pkg)
+        return pkgs
+
+
+class FakePamac():
+    def __init__(self, repos):
+        self.db = FakeDatabase(repos)
+
+    def get_repos(self):
+        return list(self.db.repos)
+
+
+class FakeAsyncPkg():
+    def __init__(self, name):
+        self.name = name
+        self.threads = set()
+
+    def __getattr__(self, attr):
+        if not attr.startswith("get_"):
+            raise AttributeError(attr)
+        def getter():
+            self.threads.add(threading.current_thread().name)
+            if attr.endswith("_size"):
+                return 1024
+            return self.name.title() if attr == "get_app_name" else self.name
+        return getter
+
+
+class FakeAsyncDatabase():
+    """
+    answers *_async calls from the calling thread's default main context,
+    the way libpamac does, after an optional delay in seconds
+    """
+    def __init__(self, pkgs, delays={}):
+        self.pkgs = {name: FakeAsyncPkg(name) for name in pkgs}
+        self.delays = delays
+        self.errors = set()
+        self.threads = set()
+
+    def _answer(self, kind, callback, result, *data):
+        self.threads.add(threading.current_thread().name)
+        context = GLib.MainContext.get_thread_default() or GLib.MainContext.default()
+        delay = self.delays.get(kind, 0)
+        source = GLib.timeout_source_new(int(delay * 1000)) if delay else GLib.idle_source_new()
+        def dispatch(*args):
+            callback(self, (kind, result), *data)
+            return False
+        source.set_callback(dispatch)
+        source.attach(context)
+
+    def _finish(self, result):
+        kind, value = result
+        if kind in self.errors:
+            raise GLib.GError(f"{kind} failed")
+        return value
+
+    def search_pkgs_async(self, value, callback, *data):
+        self._answer("packages", callback, [p for n, p in self.pkgs.items() if value in n], *data)
+
+    def search_snaps_async(self, value, callback, *data):
+        self._answer("snaps", callback, [p for n, p in self.pkgs.items() if value in n], *data)
+
+    def search_flatpaks_async(self, value, callback, *data):
+        self._answer("flatpaks", callback, [], *data)
+
+    def get_snap_async(self, name, callback, *data):
+        self._answer("snap", callback, self.pkgs.get(name), *data)
+
+    def get_flatpak_async(self, name, callback, *data):
+        self._answer("flatpak", callback, self.pkgs.get(name), *data)
+
+    def get_pkg(self, name):
+        self.threads.add(threading.current_thread().name)
+        return self.pkgs.get(name)
+
+    def get_installed_pkgs(self):
+        self.threads.add(threading.current_thread().name)
+        return list(self.pkgs.values())
+
+    def get_repos_names(self):
+        self.threads.add(threading.current_thread().name)
+        return ["extra"]
+
+    def get_categories_names(self):
+        self.threads.add(threading.current_thread().name)
+        return ["Featured", "Graphics"]
+
+    search_pkgs_finish = search_snaps_finish = search_flatpaks_finish = _finish
+    get_snap_finish = get_flatpak_finish = _finish
+
+
+class TestWorker(unittest.TestCase):
+    def test_concurrent_callers(self):
+        class Pm():
+            db = FakeAsyncDatabase(["gimp", "inkscape", "krita"])
+        pm = Pm()
+        worker = Worker.QueryWorker(pm)
+        worker.start()
+        self.addCleanup(worker.stop)
+        results = {}
+        def query(n):
+            results[n] = (
+                worker.get_snaps_details_many(["gimp", "missing", "krita", "gimp"]).result(5),
+                worker.get_snap_details("inkscape").result(5),
+                worker.get_flatpak_details("missing").result(5),
+                worker.search_snaps("k").result(5)
+            )
+        threads = [threading.Thread(target=query, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(10)
+        self.assertEqual(len(results), 8)
+        for many, single, missing, found in results.values():
+            self.assertEqual(list(many), ["gimp", "missing", "krita"])
+            self.assertIsNone(many["missing"])
+            self.assertEqual(many["krita"]["title"], "Krita")
+            self.assertEqual(single["download_size"], "1.0 KB")
+            self.assertEqual(missing, {})
+            self.assertEqual([p.name for p in found], ["inkscape", "krita"])
+        self.assertEqual(pm.db.threads, {"pamac-worker"})
+        for pkg in pm.db.pkgs.values():
+            self.assertEqual(pkg.threads, {"pamac-worker"})
+        print(f"test worker concurrent callers done!")
+
+
+class TestAsyncPamac(unittest.TestCase):
+    def make_pm(self):
+        class Pm():
+            worker = None
+            def __init__(self):
+                self.db = FakeAsyncDatabase(["gimp", "gimp-help"], delays={"snaps": 0.02})
+                self.threads = []
+            def get_pkg_details(self, pkg):
+                self.threads.append(threading.current_thread())
+                return Packages.Package(FakePamac({"extra": [pkg]})).get_details(pkg)
+        return Pm()
+
+    async def queries(self, i):
+        return await asyncio.gather(
+            i.search_pkgs("gimp"), i.search_snaps("help"), i.get_snap_details("missing"),
+            i.get_snap_details("gimp"), i.search_flatpaks("gimp"), return_exceptions=True
+        )
+
+    def check(self, results):
+        pkgs, snaps, missing, details, error = results
+        self.assertEqual([p.name for p in pkgs], ["gimp", "gimp-help"])
+        self.assertEqual([p.name for p in snaps], ["gimp-help"])
+        self.assertEqual(missing, {})
+        self.assertEqual(details["title"], "Gimp")
+        self.assertIsInstance(error, GLib.GError)
+
+    def test_context_bridge(self):
+        pm = self.make_pm()
+        pm.db.errors.add("flatpaks")
+        i = AsyncPackageManager.AsyncPamac(pm)
+        self.check(asyncio.run(self.queries(i)))
+        self.assertEqual(i._pending, 0)
+        details = asyncio.run(i.get_pkg_details("gimp"))
+        self.assertEqual(details["name"], "gimp")
+        self.assertEqual(pm.threads, [threading.current_thread()])
+        def fail(*args):
+            raise TypeError("bad call")
+        pm.db.search_pkgs_async = fail
+        with self.assertRaises(TypeError):
+            asyncio.run(i.search_pkgs("gimp"))
+        self.assertEqual(i._pending, 0)
+        print(f"test async context bridge done!")
+
+    def test_worker_bridge(self):
+        pm = self.make_pm()
+        pm.db.errors.add("flatpaks")
+        pm.worker = Worker.QueryWorker(pm)
+        pm.worker.start()
+        self.addCleanup(pm.worker.stop)
+        i = AsyncPackageManager.AsyncPamac(pm)
+        self.check(asyncio.run(self.queries(i)))
+        pm.package = Packages.Package(pm)
+        pm.get_pkg_details = lambda pkg: pm.worker.get_pkg_details(pkg).result()
+        details = asyncio.run(i.get_pkg_details("gimp"))
+        self.assertEqual(details["name"], "gimp")
+        self.assertEqual(pm.db.threads, {"pamac-worker"})
+        self.assertEqual(pm.db.pkgs["gimp"].threads, {"pamac-worker"})
+        print(f"test async worker bridge done!")
+
+
+class TestPackage(unittest.TestCase):
+    def test_get_available(self):
+        pm = FakePamac({"core": ["linux", "bash"], "extra": ["gimp", "bash"]})
+        i = Packages.Package(pm)
+        pkgs = i.get_available()
+        self.assertEqual([p.get_name() for p in pkgs], ["linux", "bash", "gimp"])
+        self.assertEqual(pkgs[1].get_repo(), "core")
+        self.assertEqual(len(i.get_available()), 3)
+        self.assertEqual(next(i.iter_available()).get_name(), "linux")
+        print(f"test get available done!")
+
+    def test_lazy_details(self):
+        pm = FakePamac({"extra": ["gimp"]})
+        p = Packages.Package(pm).get_details("gimp")
+        self.assertEqual(p["name"], "gimp")
+        self.assertEqual(p["repository"], "extra")
+        self.assertEqual(p["format"], "package")
+        self.assertIn("files", p)
+        self.assertEqual(p._pkg.files_calls, 0)
+        self.assertEqual(p["files"], ["/usr/bin/gimp"])
+        p["files"]
+        self.assertEqual(p._pkg.files_calls, 1)
+        p["extra"] = True
+        self.assertTrue(p.get("extra"))
+        self.assertEqual(len(p), len(Packages.DETAILS) + 1)
+        self.assertIsInstance(p, dict)
+        plain = p.to_dict()
+        self.assertEqual(json.loads(json.dumps(p)), plain)
+        fresh = Packages.Package(pm).get_details("gimp")
+        self.assertEqual(json.loads(json.dumps({"details": fresh}))["details"]["name"], "gimp")
+        self.assertEqual(dict(Packages.Package(pm).get_details("gimp")), {k: v for k, v in plain.items() if k != "extra"})
+        self.assertEqual(Packages.Package(pm).get_details("missing"), {})
+        print(f"test lazy details done!")
+
+    def test_many(self):
+        pm = FakePamac({"core": ["bash"], "extra": ["gimp"]})
+        i = Packages.Package(pm)
+        names = i.get_app_names_many(["gimp", "bash", "missing"])
+        self.assertDictEqual(names, {"gimp": "Gimp", "bash": "bash", "missing": None})
+        details = i.get_details_many(["gimp", "missing"])
+        self.assertEqual(details["gimp"]["name"], "gimp")
+        self.assertIsNone(details["missing"])
+        print(f"test many done!")
+
+
+class TestJsonStream(unittest.TestCase):
+    def parse(self, doc, chunk_size, key="items"):
+        return list(Utils.iter_json_array(io.BytesIO(doc.encode()), key, chunk_size))
+
+    def test_numbers(self):
+        for doc in ('{"items":[1.5, 1]}', '{"items":[12.5e3,-0.25E-2 , 7, true, null]}'):
+            for chunk_size in range(1, 8):
+                self.assertEqual(self.parse(doc, chunk_size), json.loads(doc)["items"])
+        print(f"test json stream numbers done!")
+
+    def test_utf8_and_skipped_keys(self):
+        doc = '{"skip": {"a": [1, "]", 2.5]}, "n": 3.25, "items": ["héllo ✓", {"x": "日本"}], "after": 1}'
+        for chunk_size in range(1, 8):
+            self.assertEqual(self.parse(doc, chunk_size), ["héllo ✓", {"x": "日本"}])
+        self.assertEqual(self.parse('{"other": [1, 2]}', 1), [])
+        print(f"test json stream utf-8 and skipped keys done!")
+
+    def test_truncated(self):
+        for doc in ('{"items":[1,2', '{"items":[{"a":1}', '{"items":[1.', '{"other":1', '{"ite'):
+            for chunk_size in (1, 2, 3, 64):
+                with self.assertRaises(ValueError):
+                    self.parse(doc, chunk_size)
+        print(f"test json stream truncated input done!")
+
+
+class TestCache(unittest.TestCase):
+    def test_result_cache(self):
+        c = Cache.ResultCache(maxsize=2, ttl=60)
+        calls = []
+        self.assertEqual(c.get_or_set("a", lambda: calls.append("a") or 1), 1)
+        self.assertEqual(c.get_or_set("a", lambda: calls.append("a") or 1), 1)
+        c.set("b", 2)
+        c.set("c", 3)
+        self.assertNotIn("a", c)
+        self.assertEqual(calls, ["a"])
+        self.assertDictEqual(c.stats(), {"size": 2, "maxsize": 2, "hits": 1, "misses": 1, "evictions": 1})
+        self.assertIsNone(c.get_or_set("e", lambda: None, keep=bool))
+        self.assertNotIn("e", c)
+        c.ttl = 0
+        c.set("d", 4)
+        self.assertIsNone(c.get("d"))
+        print(f"test result cache done!")
+
+    def test_dir_signature(self):
+        path = tempfile.mkdtemp()
+        before = Cache.get_dir_signature(path)
+        open(os.path.join(path, "core.db"), "w").close()
+        self.assertNotEqual(before, Cache.get_dir_signature(path))
+        self.assertEqual(Cache.get_dir_signature(os.path.join(path, "missing")), ())
+        print(f"test dir signature done!")
+
+
+class TestTelemetry(unittest.TestCase):
+    def test_parse_download_status(self):
+        self.assertEqual(Telemetry.parse_download_status("1.5 KiB/3 MB"), (1536, 3 * 1024 ** 2))
+        self.assertEqual(Telemetry.parse_download_status("1/5"), (None, None))
+        self.assertEqual(Telemetry.get_phase("Installing gimp (2.10-1)..."), "Installing")
+        print(f"test parse download status done!")
+
+    def test_transaction_stats(self):
+        stats = Telemetry.TransactionStats()
+        events = Telemetry.EventStream(stats.add)
+        events.action("Checking dependencies...")
+        events.action_progress("Downloading gimp", "1 MB/4 MB", 0.25)
+        events.action_progress("Downloading gimp", "2 MB/4 MB", 0.5)
+        events.action("Installing gimp (2.10-1)...")
+        events.action("Installing inkscape (1.2-1)...")
+        events.hook_progress("Running post-transaction hooks...", "Updating icon theme caches", "1/2", 0.5)
+        events.warning("slow mirror")
+        events.error("failed", ["details"])
+        events.finish()
+        summary = stats.summary()
+        self.assertEqual(list(summary["phases"]), ["Checking dependencies", "Downloading", "Installing", "Running post-transaction hooks"])
+        self.assertIn("Updating icon theme caches", summary["hooks"])
+        self.assertEqual(summary["downloaded"], 2 * 1024 ** 2)
+        self.assertEqual(summary["errors"], ["failed"])
+        self.assertEqual(len([e for e in stats.events if isinstance(e, Telemetry.PhaseStart)]), 4)
+        self.assertTrue(all(isinstance(e.time, float) for e in stats.events))
+        self.assertEqual([e.message for e in stats.events if isinstance(e, Telemetry.WarningEvent)], ["slow mirror"])
+        self.assertEqual([e.details for e in stats.events if isinstance(e, Telemetry.ErrorEvent)], [["details"]])
+        self.assertFalse(hasattr(Telemetry, "Warning"))
+        print(f"test transaction stats done!")
+
+
+class TestMetrics(unittest.TestCase):
+    def test_registry(self):
+        registry = Metrics.Registry()
+        pm = FakePamac({"core": ["linux", "bash"]})
+        get_available = Packages.Package.get_available
+        registry.enable([Packages.Package])
+        try:
+            Packages.Package(pm).get_available()
+            with self.assertRaises(TypeError):
+                Packages.Package(pm).get_details()
+        finally:
+            registry.disable()
+        self.assertIs(Packages.Package.get_available, get_available)
+        metrics = registry.to_dict()
+        self.assertEqual(metrics["Packages.Package.get_available"]["calls"], 1)
+        self.assertEqual(metrics["Packages.Package.get_available"]["payload_items"], 2)
+        self.assertEqual(metrics["Packages.Package.get_details"]["errors"], 1)
+        text = registry.to_prometheus()
+        self.assertIn('manjaro_sdk_call_seconds_count{method="Packages.Package.get_available"} 1', text)
+        print(f"test metrics registry done!")
+
+    def test_generators_and_strings(self):
+        class Source():
+            def iter_items(self, n):
+                for i in range(n):
+                    time.sleep(0.01)
+                    yield i
+
+            def get_name(self):
+                return "a long application name"
+
+        registry = Metrics.Registry()
+        registry.enable([Source])
+        try:
+            items = Source().iter_items(3)
+            self.assertEqual(registry.to_dict(), {})
+            self.assertEqual(list(items), [0, 1, 2])
+            partial = Source().iter_items(3)
+            next(partial)
+            partial.close()
+            Source().get_name()
+        finally:
+            registry.disable()
+        metrics = registry.to_dict()
+        self.assertEqual(metrics["tests.Source.iter_items"]["calls"], 2)
+        self.assertEqual(metrics["tests.Source.iter_items"]["errors"], 0)
+        self.assertEqual(metrics["tests.Source.iter_items"]["payload_items"], 4)
+        self.assertGreaterEqual(metrics["tests.Source.iter_items"]["total_seconds"], 0.04)
+        self.assertEqual(metrics["tests.Source.get_name"]["payload_items"], 0)
+        print(f"test metrics generators and strings done!")
+
+
+class TestSnapshot(unittest.TestCase):
+    def test_snapshot(self):
+        path = tempfile.mkdtemp()
+        sync_path = os.path.join(path, "sync")
+        os.mkdir(sync_path)
+        snapshot = Snapshot.CatalogSnapshot(os.path.join(path, "catalog.sqlite"), sync_path)
+        self.assertTrue(snapshot.is_stale())
+        pm = FakePamac({"core": ["bash"], "extra": ["gimp", "gimp-help"]})
+        pm.get_all_pkgs = Packages.Package(pm).get_available
+        pm.get_all_appimages = lambda: ({"name": "foo.gimp", "title": "Foo", "description": "x"},)
+        snapshot.refresh(pm, formats=("packages", "appimages"), background=False)
+        self.assertFalse(snapshot.is_stale(("packages", "appimages")))
+        self.assertEqual(snapshot.get_stale_formats(), ["snaps", "flatpaks"])
+        self.assertEqual(snapshot.count(), 4)
+        self.assertEqual(snapshot.get("packages", "gimp")["version"], "1.0")
+        self.assertEqual([e["name"] for e in snapshot.search("gimp", limit=3)], ["gimp", "foo.gimp", "gimp-help"])
+        self.assertEqual([e["name"] for e in snapshot.search("gimp", pkg_format="appimages")], ["foo.gimp"])
+        changes = snapshot.update("packages", [FakePkg("bash", "core"), FakePkg("vim", "extra")])
+        self.assertDictEqual(changes, {"added": ["vim"], "removed": ["gimp", "gimp-help"], "updated": []})
+        self.assertEqual(snapshot.count("packages"), 2)
+        snapshot.refresh(pm, formats=("appimages",), background=True).join()
+        self.assertEqual(snapshot.count("appimages"), 1)
+        open(os.path.join(sync_path, "core.db"), "w").close()
+        self.assertTrue(snapshot.is_stale(("packages", "appimages")))
+        snapshot.update("packages", [FakePkg("bash", "core")])
+        self.assertEqual(snapshot.get_stale_formats(), ["snaps", "flatpaks", "appimages"])
+        snapshot.close()
+        print(f"test snapshot done!")
+
+
+class TestAppimage(unittest.TestCase):
+    def setUp(self):
+        environ = mock.patch.dict(os.environ, {"XDG_CACHE_HOME": tempfile.mkdtemp()})
+        environ.start()
+        self.addCleanup(environ.stop)
+
+    def test_feed_cache(self):
+        requests = []
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                requests.append(self.headers.get("If-None-Match"))
+                if self.headers.get("If-None-Match") == '"v1"':
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                body = json.dumps(FEED).encode()
+                self.send_response(200)
+                self.send_header("ETag", '"v1"')
+                self.end_headers()
+                self.wfile.write(body)
+            def log_message(self, *args):
+                pass
+
+        server, url = serve(Handler)
+        i = Appimages.Appimage(None)
+        i.provider = url
+        self.assertEqual(requests, [])
+        self.assertEqual(len(i.db), 2)
+        i = Appimages.Appimage(None)
+        i.provider = url
+        i.db
+        self.assertEqual(requests, [None])
+        i = Appimages.Appimage(None)
+        i.provider = url
+        i.cache_ttl = 0
+        i.db
+        self.assertEqual(requests, [None, '"v1"'])
+        server.shutdown()
+        server.server_close()
+        i = Appimages.Appimage(None)
+        i.provider = url
+        i.cache_ttl = 0
+        self.assertEqual(len(i.db), 2)
+        print(f"test appimage feed cache done!")
+
+    def test_unwritable_cache(self):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.end_headers()
+                self.wfile.write(json.dumps(FEED).encode())
+            def log_message(self, *args):
+                pass
+
+        blocker = os.path.join(tempfile.mkdtemp(), "file")
+        open(blocker, "w").close()
+        cache = os.path.join(blocker, "cache")
+        i = Appimages.Appimage(None)
+        i.cache_file = os.path.join(cache, "appimage-feed.json")
+        snapshot = Snapshot.CatalogSnapshot(os.path.join(cache, "catalog.sqlite"))
+        self.assertTrue(snapshot.is_stale())
+        server, url = serve(Handler)
+        i.provider = url
+        self.assertEqual(len(i.db), 2)
+        server.shutdown()
+        server.server_close()
+        print(f"test appimage unwritable cache done!")
+
+    def test_lookups(self):
+        i = Appimages.Appimage(None)
+        i._db = [
+            {"name": "foo.foo", "title": "Foo App", "description": "Foo"},
+            {"name": "bar.bar", "title": "Bar", "description": "Bar"},
+        ]
+        i._build_indexes()
+        self.assertTrue(i.package_exists("bar.bar"))
+        self.assertFalse(i.package_exists("baz.baz"))
+        self.assertEqual(i.get_details("bar.bar")["title"], "Bar")
+        self.assertIsNone(i.get_details("baz.baz"))
+        print(f"test appimage lookups done!")
+
+    def test_search(self):
+        i = Appimages.Appimage(None)
+        i._db = [
+            {"name": "a.editor", "title": "Foo Paint", "description": "Image editor"},
+            {"name": "b.viewer", "title": "Viewer", "description": "Views foo files"},
+            {"name": "c.foo", "title": "Foo", "description": "Foo"},
+        ]
+        i._build_indexes()
+        self.assertEqual(i.search("FOO"), ("c.foo", "a.editor", "b.viewer"))
+        self.assertEqual(i.search("foo", limit=2), ("c.foo", "a.editor"))
+        self.assertEqual(i.search("editor"), ("a.editor",))
+        self.assertEqual(i.search("missing"), ())
+        print(f"test appimage search done!")
+
+    def test_refresh(self):
+        i = Appimages.Appimage(None)
+        i._db = [
+            Appimages.AppimageRecord(i, "a/editor", "Foo Paint", "Image editor", None, None, None),
+            Appimages.AppimageRecord(i, "b/viewer", "Viewer", "Views foo files", None, None, None),
+        ]
+        i._build_indexes()
+        self.assertEqual(i.search("foo"), ("a.editor", "b.viewer"))
+        i._build_db = lambda revalidate=False: [
+            Appimages.AppimageRecord(i, "a/editor", "Foo Paint", "Image editor 2", None, None, None),
+            Appimages.AppimageRecord(i, "c/foo", "Foo", "Foo", None, None, None),
+        ]
+        changes = i.refresh()
+        self.assertDictEqual(changes, {"added": ["c.foo"], "removed": ["b.viewer"], "updated": ["a.editor"]})
+        self.assertEqual(i.search("foo"), ("c.foo", "a.editor"))
+        self.assertFalse(i.package_exists("b.viewer"))
+        self.assertEqual(i.get_details("a.editor")["description"], "Image editor 2")
+        print(f"test appimage refresh done!")
+
+    def test_installed_index(self):
+        class App():
+            def __init__(self, path):
+                with open(path) as f:
+                    self.exec = f.read()
+            def get_executable(self):
+                return self.exec
+
+        path = tempfile.mkdtemp()
+        loaded = []
+        index = Appimages.InstalledIndex(path, load=lambda p: loaded.append(p) or App(p))
+        def write(name, exec):
+            with open(os.path.join(path, name), "w") as f:
+                f.write(exec)
+        write("foo.desktop", "/opt/Foo.AppImage")
+        write("bar.desktop", "/usr/bin/bar")
+        write("notes.txt", "/opt/Notes.AppImage")
+        self.assertEqual([app.exec for app in index.get()], ["/opt/Foo.AppImage"])
+        self.assertEqual(len(loaded), 2)
+        index.get()
+        self.assertEqual(len(loaded), 2)
+        write("baz.desktop", "/opt/Baz.AppImage")
+        os.remove(os.path.join(path, "foo.desktop"))
+        self.assertEqual([app.exec for app in index.get()], ["/opt/Baz.AppImage"])
+        self.assertEqual(len(loaded), 3)
+        print(f"test installed appimage index done!")
+
+    def test_records(self):
+        feed = {"items": FEED["items"] + [
+            {"name": "Baz-App.2", "links": [{"url": "baz/baz"}], "license": "GPL",
+             "icons": [], "screenshots": ["shot.png", "https://example.org/b.png"]},
+        ]}
+        i = Appimages.Appimage(None)
+        db = list(i.iter_db(io.BytesIO(json.dumps(feed).encode())))
+        data_url = i.data_url
+        expected = [
+            {"license": "MIT", "name": "foo.foo", "version": None, "url": "https://github.com/foo/foo/releases",
+             "format": "appimage", "repository": "https://github.com/AppImage/appimage.github.io",
+             "title": "Foo App", "description": "Foo image editor", "screenshots": "", "icon": data_url + "foo.png"},
+            {"license": None, "name": "bar.bar", "version": None, "url": "https://github.com/bar/bar/releases",
+             "format": "appimage", "repository": "https://github.com/AppImage/appimage.github.io",
+             "title": "Bar", "description": "Bar player, plays foo files", "screenshots": "", "icon": None},
+            {"license": "GPL", "name": "baz.baz", "version": None, "url": "https://github.com/baz/baz/releases",
+             "format": "appimage", "repository": "https://github.com/AppImage/appimage.github.io",
+             "title": "Baz App 2", "description": "No description available",
+             "screenshots": [data_url + "shot.png", "https://example.org/b.png"], "icon": None},
+        ]
+        self.assertEqual([dict(app) for app in db], expected)
+        self.assertEqual(db, expected)
+        self.assertEqual(json.loads(json.dumps(db)), expected)
+        self.assertIsInstance(db[0], dict)
+        self.assertEqual(list(db[0]), list(expected[0]))
+        self.assertEqual((db[0]["name"], db[0]["url"], db[0].get("icon")), ("foo.foo", expected[0]["url"], expected[0]["icon"]))
+        self.assertIsNone(db[0].get("missing"))
+        with self.assertRaises(TypeError):
+            db[0]["title"] = "Other"
+        print(f"test appimage records done!")
+
+    def test_broken_feed(self):
+        i = Appimages.Appimage(None)
+        i.provider = "http://127.0.0.1:9"
+        i.cache_ttl = float("inf")
+        os.makedirs(os.path.dirname(i.cache_file), exist_ok=True)
+        with open(i.cache_file, "w") as f:
+            json.dump(FEED, f)
+        self.assertEqual(len(i.db), 2)
+        with open(i.cache_file, "w") as f:
+            f.write(json.dumps(FEED)[:120])
+        self.assertEqual(i.refresh(), {"added": [], "removed": [], "updated": []})
+        self.assertEqual(len(i.db), 2)
+        self.assertFalse(os.path.exists(i.cache_file))
+        print(f"test appimage broken feed done!")
+
+    def test_truncated_feed(self):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("ETag", '"v2"')
+                self.end_headers()
+                self.wfile.write(json.dumps(FEED).encode()[:120])
+            def log_message(self, *args):
+                pass
+
+        i = Appimages.Appimage(None)
+        os.makedirs(os.path.dirname(i.cache_file), exist_ok=True)
+        with open(i.cache_file, "w") as f:
+            json.dump(FEED, f)
+        server, url = serve(Handler)
+        i.provider = url
+        i.cache_ttl = 0
+        self.assertEqual(len(i.db), 2)
+        server.shutdown()
+        server.server_close()
+        self.assertTrue(os.path.exists(i.cache_file))
+        self.assertFalse(os.path.exists(f"{i.cache_file}.tmp"))
+        self.assertFalse(os.path.exists(f"{i.cache_file}.meta"))
+        i = Appimages.Appimage(None)
+        i.provider = "http://127.0.0.1:9"
+        i.cache_ttl = 0
+        self.assertEqual(len(i.db), 2)
+        print(f"test appimage truncated feed done!")
+
+    def test_transaction_install(self):
+        payload = bytes(range(256)) * 1024
+        ranges = []
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                name = self.path.split("/")[-1]
+                if self.path.endswith("/releases"):
+                    body = json.dumps([{"id": 1}]).encode()
+                elif self.path.endswith("/assets"):
+                    name = self.path.split("/")[3]
+                    url = f"http://127.0.0.1:{self.server.server_port}/dl/{name}.AppImage"
+                    body = json.dumps([{"browser_download_url": url, "name": f"{name}.AppImage"}]).encode()
+                else:
+                    start = 0
+                    if self.headers.get("Range"):
+                        ranges.append(self.headers["Range"])
+                        start = int(self.headers["Range"][6:-1])
+                    if name == "qux.AppImage":
+                        self.send_response(200)
+                        self.send_header("Content-Length", str(len(payload)))
+                        self.end_headers()
+                        self.wfile.write(payload[:1000])
+                        return
+                    if start >= len(payload):
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{len(payload)}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    body = payload[start:]
+                    self.send_response(206 if start else 200)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                self.send_response(200)
+                self.end_headers()
+                self.wfile.write(body)
+            def log_message(self, *args):
+                pass
+
+        class Pm():
+            def __init__(self):
+                self.progress = []
+                self.messages = []
+                self.threads = set()
+            def on_msg_emit(self, action=None, progress=None, status=None, details=[], message=None):
+                self.threads.add(threading.current_thread())
+                if message is not None:
+                    self.messages.append(message)
+                if progress is not None:
+                    self.progress.append(progress)
+
+        server, url = serve(Handler)
+        pm = Pm()
+        i = Appimages.Appimage(pm)
+        i.api_url = url
+        i.download_dir = tempfile.mkdtemp()
+        i.chunk_size = 4096
+        integrated = []
+        i.integrate = integrated.append
+        with open(os.path.join(i.download_dir, "bar.AppImage.part"), "wb") as f:
+            f.write(payload[:1000])
+        with open(os.path.join(i.download_dir, "baz.AppImage.part"), "wb") as f:
+            f.write(payload)
+        i.install = ["foo.foo", "bar.bar", "foo.foo", "baz.baz", "qux.qux"]
+        i.transaction_install()
+        server.shutdown()
+        server.server_close()
+        self.assertEqual(sorted(os.path.basename(t) for t in integrated), ["bar.AppImage", "baz.AppImage", "foo.AppImage"])
+        self.assertEqual(sorted(ranges), ["bytes=1000-", f"bytes={len(payload)}-"])
+        for target in integrated:
+            with open(target, "rb") as f:
+                self.assertEqual(f.read(), payload)
+        self.assertEqual(pm.progress.count(1.0), 3)
+        self.assertEqual(len(pm.messages), 1)
+        self.assertTrue(pm.messages[0].startswith("Error: qux.qux: "))
+        self.assertFalse(os.path.exists(os.path.join(i.download_dir, "qux.AppImage")))
+        self.assertEqual(os.path.getsize(os.path.join(i.download_dir, "qux.AppImage.part")), 1000)
+        self.assertEqual(pm.threads, {threading.current_thread()})
+        print(f"test appimage transaction install done!")
+
 
 class TestPamac(unittest.TestCase):
     def test_pkg_details(self):
@@ -63,6 +1033,120 @@ class TestPamac(unittest.TestCase):
         self.assertEqual(p["name"], pkg)
         print(f"test flatpak details done!")
 
+    def test_search_all(self):
+        i = PackageManager.Pamac()
+        i.db = FakeAsyncDatabase(["gimp", "gimp-help", "krita"], delays={"snaps": 0.05})
+        i.db.errors.add("flatpaks")
+        def broken(value, limit=None):
+            raise OSError("feed unavailable")
+        i.appimage.search = broken
+        results = {r["format"]: r["results"] for r in i.search_all("gimp", timeout=5)}
+        self.assertEqual(set(results), {"packages", "snaps", "flatpaks", "appimages"})
+        self.assertEqual([p.name for p in results["packages"]], ["gimp", "gimp-help"])
+        self.assertEqual(len(results["snaps"]), 2)
+        self.assertEqual(results["flatpaks"], ())
+        self.assertEqual(results["appimages"], ())
+        i.db.delays["snaps"] = 2
+        formats = [r["format"] for r in i.search_all("gimp", timeout=0.5, formats=("packages", "snaps"))]
+        self.assertEqual(formats, ["packages"])
+        print(f"test search all done!")
+
+    def test_threaded_reads(self):
+        options = {"config_path": "/etc/pamac.conf", "dry_run": True, "upgrade": False, "aur": False, "threaded": True}
+        i = PackageManager.Pamac(options)
+        self.addCleanup(i.close)
+        i.db = FakeAsyncDatabase(["gimp", "krita"])
+        results = {}
+        def query(n):
+            results[n] = (
+                i.get_app_name("gimp"),
+                i.get_app_names_many(["gimp", "missing"]),
+                i.get_pkgs_details_many(["krita", "missing"]),
+                i.get_repos(),
+                i.get_categories(),
+                i.get_installed_pkgs()
+            )
+        threads = [threading.Thread(target=query, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(10)
+        self.assertEqual(len(results), 4)
+        for name, names, details, repos, categories, installed in results.values():
+            self.assertEqual(name, "Gimp")
+            self.assertDictEqual(names, {"gimp": "Gimp", "missing": None})
+            self.assertEqual(details["krita"]["title"], "Krita")
+            self.assertIsNone(details["missing"])
+            self.assertEqual((repos, categories, installed), (["extra"], ["Featured", "Graphics"], ("gimp", "krita")))
+        self.assertEqual(i.db.threads, {"pamac-worker"})
+        for pkg in i.db.pkgs.values():
+            self.assertEqual(pkg.threads, {"pamac-worker"})
+        print(f"test threaded reads done!")
+
+    def test_plan_transaction(self):
+        class Transaction():
+            def __init__(self):
+                self.calls = []
+            def __getattr__(self, attr):
+                return lambda *args: self.calls.append((attr,) + args)
+
+        options = {"config_path": "/etc/pamac.conf", "dry_run": True, "upgrade": True, "aur": False}
+        i = PackageManager.Pamac(options)
+        i.db = FakeDatabase({"core": ["bash", "linux"], "extra": ["gimp", "vim", "zsh"]},
+                            installed={"bash": "0.9", "linux": "1.0", "zsh": "0.9"})
+        i.transaction = Transaction()
+        i.add_pkgs_to_install(["gimp", "gimp", "bash"])
+        i.add_pkgs_to_remove(["vim", "linux", "linux", "zsh"])
+        plan = i.plan_transaction()
+        self.assertDictEqual(plan["packages"], {
+            "install": ("gimp",), "remove": ("linux", "zsh"), "skipped": ("bash", "vim"), "conflicts": ()
+        })
+        self.assertEqual(plan["upgrade"], ("bash",))
+        self.assertTrue(i._prepare_transaction())
+        self.assertEqual(i.transaction.calls, [
+            ("set_dry_run", True), ("add_pkgs_to_upgrade", ("bash",)), ("add_pkg_to_install", "gimp"),
+            ("add_pkg_to_remove", "linux"), ("add_pkg_to_remove", "zsh")
+        ])
+
+        i.transaction = Transaction()
+        i.add_pkgs_to_install(["vim"])
+        i.add_pkgs_to_remove(["vim"])
+        self.assertEqual(i.plan_transaction()["packages"]["conflicts"], ("vim",))
+        self.assertFalse(i._prepare_transaction())
+        self.assertEqual(i.transaction.calls, [])
+        print(f"test plan transaction done!")
+
+    def test_details_cache(self):
+        i = PackageManager.Pamac()
+        i.db = FakeAsyncDatabase(["gimp"])
+        self.assertEqual(i.get_snap_details("missing"), {})
+        self.assertEqual(i.get_pkg_details("missing"), {})
+        self.assertEqual(i.cache_stats()["size"], 0)
+        i.db.pkgs["missing"] = FakeAsyncPkg("missing")
+        self.assertEqual(i.get_snap_details("missing")["name"], "missing")
+        self.assertEqual(i.get_pkg_details("missing")["name"], "missing")
+        first = i.get_snap_details("gimp")
+        first["title"] = "Changed"
+        first["note"] = True
+        second = i.get_snap_details("gimp")
+        self.assertEqual(second["title"], "Gimp")
+        self.assertNotIn("note", second)
+        self.assertEqual(i.cache_stats()["hits"], 1)
+        print(f"test details cache done!")
+
+    def test_refresh_catalogs(self):
+        i = PackageManager.Pamac()
+        i.snapshot = Snapshot.CatalogSnapshot(os.path.join(tempfile.mkdtemp(), "catalog.sqlite"), i.sync_path)
+        i.db = FakeDatabase({"core": ["bash", "vim"]})
+        refreshed = {"core": ["bash", "zsh"]}
+        i.db.refresh = lambda: setattr(i.db, "repos", refreshed)
+        changes = i.refresh_catalogs(("packages",))
+        self.assertEqual(changes["packages"]["added"], ["bash", "zsh"])
+        refreshed = {"core": ["zsh"]}
+        changes = i.refresh_catalogs(("packages",))
+        self.assertDictEqual(changes["packages"], {"added": [], "removed": ["bash"], "updated": []})
+        print(f"test refresh catalogs done!")
+
     def test_search_pkgs(self):
         i = PackageManager.Pamac()
         p = i.search_pkgs("gimp")